@@ -0,0 +1,43 @@
+"""Apply pending schema migrations to the tracker database.
+
+Usage (from the backend directory, with the same .env as the API):
+
+    python migrate.py            # run every pending migration
+    python migrate.py --status   # show pending counts without migrating
+
+Migrations are resumable, so an interrupted run can simply be started again.
+API workers run the same migrations on startup unless RUN_MIGRATIONS_ON_STARTUP
+is false; the shared lease means only one of them runs at a time.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+from server import client, get_migration_status, run_migrations
+
+
+async def main(show_status: bool) -> int:
+    try:
+        if show_status:
+            print(json.dumps(await get_migration_status(), indent=2))
+            return 0
+
+        counts = await run_migrations()
+        if counts is None:
+            print("Another process holds the migration lease; try again once it finishes")
+            return 1
+        print(json.dumps(counts, indent=2))
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--status", action="store_true", help="show pending counts without migrating")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main(args.status)))
@@ -1,14 +1,18 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Query, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, UpdateOne, ReturnDocument, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure, DuplicateKeyError, PyMongoError, BulkWriteError
 import os
 import logging
 import asyncio
+import time
+import random
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, TypeAdapter
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
@@ -18,12 +22,26 @@ import resend
 from bson import ObjectId
 import base64
 import io
+import csv
+import json
+import hashlib
+import shutil
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+from urllib.parse import quote
+import re
+import aiofiles
+import aiofiles.os
 
 # Document generation imports
 from docx import Document
 from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, landscape
@@ -39,6 +57,70 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Index registry - every hot-path query must be backed by one of these.
+# Reconciled against the live collections at startup (see ensure_indexes).
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("role", ASCENDING)], name="role"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_id"),
+    ],
+    "transcript_requests": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("student_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="student_created_id"),
+        IndexModel([("assigned_staff_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="staff_created_id"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_id"),
+        IndexModel([("student_id", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)], name="student_updated_id"),
+        IndexModel([("assigned_staff_id", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)], name="staff_updated_id"),
+        IndexModel([("updated_at", DESCENDING), ("id", DESCENDING)], name="updated_id"),
+        IndexModel([("status", ASCENDING), ("needed_by_date", ASCENDING)], name="status_needed_by"),
+        IndexModel([("documents.id", ASCENDING)], name="documents_id", sparse=True),
+    ],
+    "recommendation_requests": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("student_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="student_created_id"),
+        IndexModel([("assigned_staff_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="staff_created_id"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_id"),
+        IndexModel([("student_id", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)], name="student_updated_id"),
+        IndexModel([("assigned_staff_id", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)], name="staff_updated_id"),
+        IndexModel([("updated_at", DESCENDING), ("id", DESCENDING)], name="updated_id"),
+        IndexModel([("status", ASCENDING), ("needed_by_date", ASCENDING)], name="status_needed_by"),
+        IndexModel([("documents.id", ASCENDING)], name="documents_id", sparse=True),
+    ],
+    "notifications": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_created_id"),
+        IndexModel([("user_id", ASCENDING), ("read", ASCENDING), ("created_at", DESCENDING)], name="user_read_created"),
+    ],
+    "email_outbox": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt"),
+    ],
+    "documents": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("parent_id", ASCENDING), ("uploaded_at", ASCENDING)], name="parent_uploaded"),
+    ],
+    "request_events": [
+        IndexModel([("request_id", ASCENDING), ("bucket", ASCENDING)], name="request_bucket_unique", unique=True),
+    ],
+    "deletions": [
+        IndexModel([("collection", ASCENDING), ("audience", ASCENDING), ("deleted_at", ASCENDING), ("id", ASCENDING)], name="collection_audience_deleted_id"),
+        IndexModel([("collection", ASCENDING), ("reset", ASCENDING), ("deleted_at", DESCENDING)], name="collection_reset_deleted"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_ttl", expireAfterSeconds=0),
+    ],
+    "export_jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("cache_key", ASCENDING), ("state", ASCENDING)], name="cache_key_state"),
+        IndexModel([("state", ASCENDING), ("created_at", ASCENDING)], name="state_created"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_ttl", expireAfterSeconds=0),
+    ],
+    "password_resets": [
+        IndexModel([("token", ASCENDING)], name="token_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email"),
+    ],
+}
+
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET')
 if not JWT_SECRET:
@@ -72,6 +154,45 @@ logger = logging.getLogger(__name__)
 UPLOAD_DIR = ROOT_DIR / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Uploads are streamed to a temp file on the same filesystem, then renamed into place
+UPLOAD_TMP_DIR = UPLOAD_DIR / ".tmp"
+UPLOAD_TMP_DIR.mkdir(exist_ok=True)
+
+# Content-addressed blob store: blobs/ab/cd/abcd... named by SHA-256
+BLOB_DIR = UPLOAD_DIR / "blobs"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# A blob marked for deletion longer ago than this belongs to a crashed release
+BLOB_DELETE_STALE_SECONDS = 60
+BLOB_ACQUIRE_ATTEMPTS = 5
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_MB', '25')) * 1024 * 1024
+# Room for the multipart boundaries and part headers around the file itself
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+# Document downloads are streamed in chunks of this size
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Exports are spooled to disk here and streamed out, never held in memory
+EXPORT_DIR = ROOT_DIR / "exports"
+EXPORT_TMP_DIR = EXPORT_DIR / ".tmp"
+EXPORT_TMP_DIR.mkdir(parents=True, exist_ok=True)
+# Finished export job artifacts, named by cache key and kept for EXPORT_ARTIFACT_TTL_SECONDS
+EXPORT_ARTIFACT_DIR = EXPORT_DIR / "artifacts"
+EXPORT_ARTIFACT_DIR.mkdir(exist_ok=True)
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '500'))
+XLSX_WIDTH_SAMPLE_ROWS = int(os.environ.get('XLSX_WIDTH_SAMPLE_ROWS', '200'))
+# CSV/NDJSON exports flush to the client every STREAM_EXPORT_BATCH_SIZE rows
+STREAM_EXPORT_BATCH_SIZE = int(os.environ.get('STREAM_EXPORT_BATCH_SIZE', '100'))
+
+# List pagination
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', '1000'))
+TIMELINE_BUCKET_SIZE = int(os.environ.get('TIMELINE_BUCKET_SIZE', '50'))
+TIMELINE_APPEND_ATTEMPTS = 3
+
+# Delta sync: how long tombstones are kept, and how far behind "now" a final
+# watermark is held so writes still in flight are picked up by the next call
+DELETION_LOG_TTL_SECONDS = int(os.environ.get('DELETION_LOG_TTL_SECONDS', str(30 * 24 * 3600)))
+CHANGES_SETTLE_SECONDS = int(os.environ.get('CHANGES_SETTLE_SECONDS', '5'))
+
 # ==================== MODELS ====================
 
 class UserBase(BaseModel):
@@ -134,6 +255,7 @@ class TranscriptRequestUpdate(BaseModel):
     rejection_reason: Optional[str] = None
     staff_notes: Optional[str] = None
     note: Optional[str] = None  # Note for status changes
+    expected_version: Optional[int] = None  # Reject with 409 if the request changed since it was read
 
 class TranscriptRequestResponse(BaseModel):
     id: str
@@ -166,9 +288,44 @@ class TranscriptRequestResponse(BaseModel):
     staff_notes: Optional[str] = None
     documents: List[dict] = []
     timeline: List[dict] = []
+    last_event: Optional[dict] = None
+    version: int = 0
+    created_at: str
+    updated_at: str
+
+class TranscriptRequestSummary(BaseModel):
+    """List-view shape of a transcript request (no timeline or documents)"""
+    id: str
+    student_id: str
+    student_name: str
+    student_email: str
+    first_name: str
+    middle_name: str = ""
+    last_name: str
+    school_id: str = ""
+    enrollment_status: str
+    academic_years: List[dict] = []
+    academic_year: str = ""  # Legacy field for backward compatibility
+    reason: str
+    needed_by_date: str
+    collection_method: str
+    institution_name: str = ""
+    status: str
+    assigned_staff_id: Optional[str] = None
+    assigned_staff_name: Optional[str] = None
     created_at: str
     updated_at: str
 
+TRANSCRIPT_SUMMARY_LIST = TypeAdapter(List[TranscriptRequestSummary])
+
+class TranscriptRequestChanges(BaseModel):
+    """One page of /requests/changes"""
+    changes: List[TranscriptRequestSummary]
+    deleted: List[str]
+    reset: bool
+    watermark: str
+    has_more: bool
+
 class NotificationResponse(BaseModel):
     id: str
     user_id: str
@@ -243,6 +400,7 @@ class RecommendationRequestUpdate(BaseModel):
     staff_notes: Optional[str] = None
     co_curricular_activities: Optional[str] = None
     note: Optional[str] = None  # Note for status changes
+    expected_version: Optional[int] = None  # Reject with 409 if the request changed since it was read
     # Fields students can update for pending requests
     first_name: Optional[str] = None
     middle_name: Optional[str] = None
@@ -293,9 +451,46 @@ class RecommendationRequestResponse(BaseModel):
     staff_notes: Optional[str] = None
     documents: List[dict] = []
     timeline: List[dict] = []
+    last_event: Optional[dict] = None
+    version: int = 0
+    created_at: str
+    updated_at: str
+
+class RecommendationRequestSummary(BaseModel):
+    """List-view shape of a recommendation request (no timeline or documents)"""
+    id: str
+    student_id: str
+    student_name: str
+    student_email: str
+    first_name: str
+    middle_name: str = ""
+    last_name: str
+    email: str
+    years_attended: List[dict] = []
+    years_attended_str: str = ""  # Legacy string format for backward compatibility
+    enrollment_status: str = ""
+    last_form_class: str
+    reason: str = ""
+    institution_name: str
+    program_name: str
+    needed_by_date: str
+    collection_method: str
+    status: str
+    assigned_staff_id: Optional[str] = None
+    assigned_staff_name: Optional[str] = None
     created_at: str
     updated_at: str
 
+RECOMMENDATION_SUMMARY_LIST = TypeAdapter(List[RecommendationRequestSummary])
+
+class RecommendationRequestChanges(BaseModel):
+    """One page of /recommendations/changes"""
+    changes: List[RecommendationRequestSummary]
+    deleted: List[str]
+    reset: bool
+    watermark: str
+    has_more: bool
+
 class StudentRecommendationUpdate(BaseModel):
     first_name: Optional[str] = None
     middle_name: Optional[str] = None
@@ -316,11 +511,46 @@ class StudentRecommendationUpdate(BaseModel):
 
 # ==================== HELPER FUNCTIONS ====================
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+# bcrypt is deliberately slow (~250 ms) and releases the GIL, so it runs on a
+# dedicated thread pool. Once BCRYPT_MAX_PENDING calls are queued or running,
+# new ones are refused with 503 instead of piling up behind a login burst.
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', str(min(4, os.cpu_count() or 1))))
+BCRYPT_MAX_PENDING = int(os.environ.get('BCRYPT_MAX_PENDING', '32'))
+bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+bcrypt_stats = {"pending": 0, "completed": 0, "rejected": 0, "failed": 0, "total_ms": 0.0, "max_ms": 0.0}
+
+async def run_bcrypt(func, *args):
+    if bcrypt_stats["pending"] >= BCRYPT_MAX_PENDING:
+        bcrypt_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please try again shortly",
+            headers={"Retry-After": "1"}
+        )
+    
+    bcrypt_stats["pending"] += 1
+    started = time.monotonic()
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(bcrypt_executor, func, *args)
+    except Exception:
+        bcrypt_stats["failed"] += 1
+        raise
+    finally:
+        bcrypt_stats["pending"] -= 1
+    
+    # Only successful hashes/verifies feed the timing stats
+    elapsed_ms = (time.monotonic() - started) * 1000
+    bcrypt_stats["completed"] += 1
+    bcrypt_stats["total_ms"] += elapsed_ms
+    bcrypt_stats["max_ms"] = max(bcrypt_stats["max_ms"], elapsed_ms)
+    return result
+
+async def hash_password(password: str) -> str:
+    hashed = await run_bcrypt(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt())
+    return hashed.decode('utf-8')
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+async def verify_password(password: str, hashed: str) -> bool:
+    return await run_bcrypt(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
 
 def create_token(user_id: str, email: str, role: str) -> str:
     payload = {
@@ -339,13 +569,340 @@ def decode_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+# LRU + TTL cache of user documents for the auth dependency. Entries are
+# dropped locally whenever a user is deleted or their credentials change;
+# the TTL bounds staleness across uvicorn workers.
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '1024'))
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '30'))
+_user_cache = OrderedDict()  # user id -> (expires_at monotonic, user doc)
+user_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+def get_cached_user(user_id: str) -> Optional[dict]:
+    entry = _user_cache.get(user_id)
+    if entry and entry[0] > time.monotonic():
+        _user_cache.move_to_end(user_id)
+        user_cache_stats["hits"] += 1
+        return dict(entry[1])
+    if entry:
+        del _user_cache[user_id]
+    user_cache_stats["misses"] += 1
+    return None
+
+def cache_user(user: dict):
+    _user_cache[user["id"]] = (time.monotonic() + USER_CACHE_TTL_SECONDS, user)
+    _user_cache.move_to_end(user["id"])
+    while len(_user_cache) > USER_CACHE_SIZE:
+        _user_cache.popitem(last=False)
+        user_cache_stats["evictions"] += 1
+
+def invalidate_cached_user(user_id: Optional[str] = None):
+    if user_id:
+        _user_cache.pop(user_id, None)
+    else:
+        _user_cache.clear()
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
     payload = decode_token(token)
-    user = await db.users.find_one({"id": payload["sub"]}, {"_id": 0})
+    return await get_token_user(payload["sub"])
+
+async def get_token_user(user_id: str) -> dict:
+    user = get_cached_user(user_id)
+    if user:
+        return user
+    
+    user = await db.users.find_one({"id": user_id}, {"_id": 0})
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
-    return user
+    cache_user(user)
+    return dict(user)
+
+def encode_cursor(doc: dict) -> str:
+    """Build an opaque keyset cursor from the last document of a page"""
+    raw = json.dumps([doc["created_at"], doc["id"]]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('utf-8')
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, doc_id
+
+async def fetch_page(collection, query: dict, projection: dict, limit: int, cursor: Optional[str], response: Response) -> List[dict]:
+    """Fetch one page ordered by (created_at, id) descending.
+    
+    Uses keyset pagination so every page is an index range scan regardless of
+    depth. When more documents remain, the cursor for the next page is returned
+    in the X-Next-Cursor response header.
+    """
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": doc_id}}
+        ]}]}
+    
+    docs = await collection.find(query, projection).sort(
+        [("created_at", DESCENDING), ("id", DESCENDING)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(docs[-1])
+    return docs
+
+# Legacy fields that normalize_*_data derives from another stored field
+DERIVED_FIELD_SOURCES = {
+    "academic_year": ["academic_years"],
+    "academic_years": ["academic_year"],
+    "years_attended_str": ["years_attended"],
+}
+
+def list_projection(model, fields: Optional[str]) -> tuple:
+    """Resolve a fields= selection into (selected fields, Mongo projection).
+    
+    Without a selection every field of the summary model is returned. The
+    projection is pushed down to the cursor so timeline/documents never leave
+    the database for list views.
+    """
+    if fields:
+        selected = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = selected - set(model.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        selected.add("id")
+    else:
+        selected = set(model.model_fields)
+    
+    # id and created_at are always needed to build the next-page cursor, and
+    # schema_version tells the normalizers whether there is anything to do
+    projection = {"_id": 0, "id": 1, "created_at": 1, "schema_version": 1}
+    for field in selected:
+        projection[field] = 1
+        for source in DERIVED_FIELD_SOURCES.get(field, []):
+            projection[source] = 1
+    return selected, projection
+
+def list_response(adapter: TypeAdapter, rows: List[dict], response: Response) -> Response:
+    """Validate and serialize a page of rows in one pass, bypassing response_model.
+    
+    Building a model per row and letting FastAPI re-validate and re-encode the
+    list costs two full passes in Python; a TypeAdapter does both in pydantic-core.
+    """
+    content = adapter.dump_json(adapter.validate_python(rows))
+    return Response(content=content, media_type="application/json", headers=dict(response.headers))
+
+def sparse_response(rows: List[dict], selected: set, response: Response) -> JSONResponse:
+    """Return only the selected fields of each row, bypassing response_model"""
+    content = [{field: row.get(field) for field in selected} for row in rows]
+    return JSONResponse(content=content, headers=dict(response.headers))
+
+async def bump_change_counter(collection_name: str):
+    """Advance the collection's write sequence after a committed write.
+    
+    updated_at is stamped before the write commits, so two concurrent writes
+    can commit out of order and leave max(updated_at) unchanged; the sequence
+    moves on every write regardless.
+    """
+    await db.change_counters.update_one({"_id": collection_name}, {"$inc": {"seq": 1}}, upsert=True)
+
+async def scope_watermark(collection, query: dict, field: str) -> list:
+    """Row count, newest value of field and write sequence for the matching documents.
+    
+    Both halves are answered from an index ((scope, field) for the max, the
+    scope prefix for the count), so this never reads the documents themselves.
+    The empty scope has no prefix to count on; count_documents({}) would walk
+    the whole collection, so it uses the count kept in collection metadata.
+    The collection-wide sequence (see bump_change_counter) is read first, so
+    a page read after it can only be newer than the ETag, never older.
+    """
+    counter = await db.change_counters.find_one({"_id": collection.name})
+    if query:
+        count = await collection.count_documents(query)
+    else:
+        count = await collection.estimated_document_count()
+    latest = await collection.find_one(query, {"_id": 0, field: 1}, sort=[(field, DESCENDING)])
+    return [count, latest.get(field) if latest else None, counter["seq"] if counter else 0]
+
+async def notification_watermark(user_id: str) -> list:
+    """Count, newest created_at and unread count of a user's notifications.
+    
+    Notifications are never edited except to mark them read, so the unread
+    count stands in for updated_at. One aggregate covered by user_read_created.
+    """
+    stats = await db.notifications.aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$group": {
+            "_id": None,
+            "count": {"$sum": 1},
+            "last": {"$max": "$created_at"},
+            "unread": {"$sum": {"$cond": [{"$eq": ["$read", False]}, 1, 0]}}
+        }}
+    ]).to_list(1)
+    if not stats:
+        return [0, None, 0]
+    return [stats[0]["count"], stats[0]["last"], stats[0]["unread"]]
+
+def weak_etag(*parts) -> str:
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match uses weak comparison, so the W/ prefix is ignored on both sides"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in [t.removeprefix("W/") for t in tags]
+
+def check_not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Set the ETag on the response and return a 304 if the client already has it"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=dict(response.headers))
+    return None
+
+async def detail_etag(collection, request_id: str, current_user: dict) -> str:
+    """Authorize a detail view and return its ETag without loading the document.
+    
+    Every write to a request bumps its version (uploads and timeline entries
+    included), so (version, updated_at) identifies the full detail response.
+    """
+    head = await collection.find_one(
+        {"id": request_id},
+        {"_id": 0, "student_id": 1, "version": 1, "updated_at": 1, "schema_version": 1}
+    )
+    if not head:
+        raise HTTPException(status_code=404, detail="Request not found")
+    
+    # Check permissions
+    if current_user["role"] == "student" and head["student_id"] != current_user["id"]:
+        raise HTTPException(status_code=403, detail="You can only view your own requests")
+    
+    return weak_etag(collection.name, request_id, head.get("version"), head.get("updated_at"), head.get("schema_version"))
+
+def request_scope(current_user: dict) -> dict:
+    """Query limiting a request listing to what the current user may see"""
+    if current_user["role"] == "student":
+        # Students can only see their own requests
+        return {"student_id": current_user["id"]}
+    if current_user["role"] == "staff":
+        # Staff can see assigned requests
+        return {"assigned_staff_id": current_user["id"]}
+    # Admin can see all requests
+    return {}
+
+async def record_deletion(collection_name: str, request_id: str, audience: List[str], reason: str):
+    """Log that a request left the listing of the given users.
+    
+    Requests are only ever removed wholesale (see record_collection_reset), so
+    today the tombstones cover reassignment: the previous staff member's
+    /changes feed must drop a request it no longer matches.
+    """
+    now = datetime.now(timezone.utc)
+    await db.deletions.insert_one({
+        "id": str(uuid.uuid4()),
+        "collection": collection_name,
+        "request_id": request_id,
+        "audience": audience,
+        "reason": reason,
+        "deleted_at": now.isoformat(),
+        "expires_at": now + timedelta(seconds=DELETION_LOG_TTL_SECONDS)
+    })
+
+async def record_collection_reset(collection_name: str):
+    """Mark a collection as emptied so every /changes client resyncs from scratch.
+    
+    Reset markers have no expires_at and are kept forever (one per clear).
+    """
+    await db.deletions.insert_one({
+        "id": str(uuid.uuid4()),
+        "collection": collection_name,
+        "reset": True,
+        "deleted_at": datetime.now(timezone.utc).isoformat()
+    })
+
+def encode_watermark(position: list) -> str:
+    raw = json.dumps(position).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('utf-8')
+
+def decode_watermark(since: str) -> list:
+    try:
+        updated_at, doc_id, deleted_at, deletion_id, epoch = json.loads(base64.urlsafe_b64decode(since.encode('utf-8')))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid watermark")
+    return [updated_at, doc_id, deleted_at, deletion_id, epoch]
+
+def after_position(field: str, value: str, doc_id: str) -> dict:
+    return {"$or": [{field: {"$gt": value}}, {field: value, "id": {"$gt": doc_id}}]}
+
+async def fetch_changes(collection, query: dict, projection: dict, current_user: dict, since: Optional[str], limit: int) -> dict:
+    """Documents changed and tombstones written since a client watermark.
+    
+    The watermark is an opaque (updated_at, id) position in the collection, a
+    (deleted_at, id) position in the deletion log, and the reset epoch the
+    client last synced under. A missing or outdated watermark (the collection
+    was cleared, or the log has expired past it) restarts from the beginning
+    with reset=True, telling the client to drop its local copy first.
+    
+    Positions only advance as far as now - CHANGES_SETTLE_SECONDS once a feed
+    is exhausted, so a write whose timestamp was taken before the read but
+    committed after it is re-sent rather than skipped. Clients apply deleted
+    before changes and treat both as idempotent upserts/removals.
+    """
+    now = datetime.now(timezone.utc)
+    horizon = (now - timedelta(seconds=DELETION_LOG_TTL_SECONDS)).isoformat()
+    settled = (now - timedelta(seconds=CHANGES_SETTLE_SECONDS)).isoformat()
+    
+    marker = await db.deletions.find_one(
+        {"collection": collection.name, "reset": True},
+        {"_id": 0, "deleted_at": 1},
+        sort=[("deleted_at", DESCENDING)]
+    )
+    epoch = marker["deleted_at"] if marker else None
+    
+    reset = True
+    if since:
+        updated_at, doc_id, deleted_at, deletion_id, since_epoch = decode_watermark(since)
+        reset = since_epoch != epoch or deleted_at < horizon
+    if reset:
+        # Nothing deleted before now can matter to a client starting over
+        updated_at, doc_id, deleted_at, deletion_id = "", "", now.isoformat(), ""
+    
+    docs = await collection.find(
+        {"$and": [query, after_position("updated_at", updated_at, doc_id)]},
+        projection
+    ).sort([("updated_at", ASCENDING), ("id", ASCENDING)]).limit(limit + 1).to_list(limit + 1)
+    
+    tombstones = await db.deletions.find(
+        {"collection": collection.name, "audience": current_user["id"], **after_position("deleted_at", deleted_at, deletion_id)},
+        {"_id": 0, "id": 1, "request_id": 1, "deleted_at": 1}
+    ).sort([("deleted_at", ASCENDING), ("id", ASCENDING)]).limit(limit + 1).to_list(limit + 1)
+    
+    docs_more = len(docs) > limit
+    tombstones_more = len(tombstones) > limit
+    docs = docs[:limit]
+    tombstones = tombstones[:limit]
+    
+    if docs:
+        updated_at, doc_id = docs[-1]["updated_at"], docs[-1]["id"]
+    if not docs_more and updated_at > settled:
+        updated_at, doc_id = settled, ""
+    if tombstones:
+        deleted_at, deletion_id = tombstones[-1]["deleted_at"], tombstones[-1]["id"]
+    if not tombstones_more and deleted_at > settled:
+        deleted_at, deletion_id = settled, ""
+    
+    return {
+        "changes": docs,
+        "deleted": [t["request_id"] for t in tombstones],
+        "reset": reset,
+        "watermark": encode_watermark([updated_at, doc_id, deleted_at, deletion_id, epoch]),
+        "has_more": docs_more or tombstones_more
+    }
 
 async def require_role(roles: List[str]):
     async def role_checker(user: dict = Depends(get_current_user)):
@@ -354,26 +911,8 @@ async def require_role(roles: List[str]):
         return user
     return role_checker
 
-async def send_email_notification(to_email: str, subject: str, html_content: str):
-    if not RESEND_API_KEY:
-        logger.warning("Resend API key not configured, skipping email")
-        return None
-    try:
-        params = {
-            "from": SENDER_EMAIL,
-            "to": [to_email],
-            "subject": subject,
-            "html": html_content
-        }
-        result = await asyncio.to_thread(resend.Emails.send, params)
-        logger.info(f"Email sent to {to_email}")
-        return result
-    except Exception as e:
-        logger.error(f"Failed to send email: {str(e)}")
-        return None
-
-async def create_notification(user_id: str, title: str, message: str, notif_type: str, request_id: str = None):
-    notification = {
+def build_notification(user_id: str, title: str, message: str, notif_type: str, request_id: str = None) -> dict:
+    return {
         "id": str(uuid.uuid4()),
         "user_id": user_id,
         "title": title,
@@ -383,53 +922,59 @@ async def create_notification(user_id: str, title: str, message: str, notif_type
         "request_id": request_id,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
+
+async def create_notification(user_id: str, title: str, message: str, notif_type: str, request_id: str = None):
+    notification = build_notification(user_id, title, message, notif_type, request_id)
     await db.notifications.insert_one(notification)
+    publish_local_notifications([notification])
     return notification
 
-async def check_and_notify_overdue_requests():
-    """Check for overdue requests and notify admins"""
-    now = datetime.now(timezone.utc)
-    today_str = now.strftime("%Y-%m-%d")
-    
-    # Find overdue requests that haven't been notified today
-    overdue_requests = await db.transcript_requests.find({
-        "needed_by_date": {"$lt": today_str},
-        "status": {"$nin": ["Completed", "Rejected"]},
-        "$or": [
-            {"overdue_notified_date": {"$exists": False}},
-            {"overdue_notified_date": {"$ne": today_str}}
-        ]
-    }).to_list(None)
-    
-    if not overdue_requests:
-        return
-    
-    # Get all admin users
-    admins = await db.users.find({"role": "admin"}, {"_id": 0, "id": 1}).to_list(None)
-    
-    for req in overdue_requests:
-        try:
-            needed_date = datetime.strptime(req["needed_by_date"], "%Y-%m-%d")
-            days_overdue = (now.replace(tzinfo=None) - needed_date).days
-            
-            student_name = f"{req.get('first_name', '')} {req.get('last_name', '')}"
-            title = "⚠️ Overdue Transcript Request"
-            message = f"Request from {student_name} is {days_overdue} day(s) overdue. Needed by: {req['needed_by_date']}"
-            
-            # Notify all admins
-            for admin in admins:
-                await create_notification(admin["id"], title, message, "overdue", req["id"])
-            
-            # Mark as notified today
-            await db.transcript_requests.update_one(
-                {"id": req["id"]},
-                {"$set": {"overdue_notified_date": today_str}}
-            )
-        except Exception as e:
-            print(f"Error notifying overdue request: {e}")
+async def notify_many(user_ids: List[str], title: str, message: str, notif_type: str, request_id: str = None) -> List[dict]:
+    """Create the same notification for several users with a single insert"""
+    notifications = [build_notification(user_id, title, message, notif_type, request_id) for user_id in user_ids]
+    if notifications:
+        await db.notifications.insert_many(notifications, ordered=False)
+        publish_local_notifications(notifications)
+    return notifications
+
+async def notify_role(role: str, title: str, message: str, notif_type: str, request_id: str = None) -> List[dict]:
+    return await notify_many(await get_role_member_ids(role), title, message, notif_type, request_id)
+
+# role -> (expires_at monotonic, [user ids]). Invalidated locally on user
+# create/delete; the TTL bounds staleness across uvicorn workers.
+ROLE_CACHE_TTL_SECONDS = int(os.environ.get('ROLE_CACHE_TTL_SECONDS', '60'))
+_role_member_cache = {}
+
+async def get_role_member_ids(role: str) -> List[str]:
+    cached = _role_member_cache.get(role)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    user_ids = [u["id"] async for u in db.users.find({"role": role}, {"_id": 0, "id": 1})]
+    _role_member_cache[role] = (time.monotonic() + ROLE_CACHE_TTL_SECONDS, user_ids)
+    return user_ids
+
+def invalidate_role_members(role: Optional[str] = None):
+    if role:
+        _role_member_cache.pop(role, None)
+    else:
+        _role_member_cache.clear()
+
+# Highest migration applied per collection (see SCHEMA MIGRATIONS). Documents at
+# this version are stored normalized, so the read path returns them untouched.
+SCHEMA_VERSIONS = {"transcript_requests": 1, "recommendation_requests": 1}
+
+def normalized_changes(normalize, request_data: dict) -> dict:
+    """Fields a normalizer would add or change, i.e. what to $set to store it normalized"""
+    legacy = {field: value for field, value in request_data.items() if field != "schema_version"}
+    normalized = normalize(legacy)
+    return {field: value for field, value in normalized.items() if field not in legacy or legacy[field] != value}
 
 def normalize_recommendation_data(request_data: dict) -> dict:
     """Normalize recommendation request data for backward compatibility"""
+    if request_data.get("schema_version", 0) >= SCHEMA_VERSIONS["recommendation_requests"]:
+        return request_data
+    
     # Make a copy to avoid modifying original
     data = dict(request_data)
     
@@ -480,6 +1025,9 @@ def normalize_recommendation_data(request_data: dict) -> dict:
 
 def normalize_transcript_data(request_data: dict) -> dict:
     """Normalize transcript request data for backward compatibility"""
+    if request_data.get("schema_version", 0) >= SCHEMA_VERSIONS["transcript_requests"]:
+        return request_data
+    
     # Make a copy to avoid modifying original
     data = dict(request_data)
     
@@ -556,7 +1104,183 @@ async def notify_status_change(request_data: dict, old_status: str, new_status:
         </div>
     </div>
     """
-    await send_email_notification(student["email"], f"Transcript Request: {new_status}", html_content)
+    await enqueue_email(student["email"], f"Transcript Request: {new_status}", html_content)
+
+def timeline_update(update: dict, events: List[dict]) -> dict:
+    """Fold the parent-side bookkeeping for new timeline events into an update.
+    
+    The parent keeps only the latest event and a running event_count; the
+    increment reserves a contiguous range of sequence numbers for the events.
+    """
+    update.setdefault("$inc", {})["event_count"] = len(events)
+    update.setdefault("$set", {})["last_event"] = events[-1]
+    return update
+
+async def write_timeline_events(request_id: str, events: List[dict]):
+    """Push sequenced events into their buckets, skipping any already stored.
+    
+    Each push is guarded on its seq being absent, so a retried or repeated
+    write never duplicates an event. When the bucket exists and already holds
+    the seq, the guarded upsert collides on request_bucket_unique instead,
+    which is the same "already there" outcome.
+    """
+    try:
+        await db.request_events.bulk_write([
+            UpdateOne(
+                {"request_id": request_id, "bucket": event["seq"] // TIMELINE_BUCKET_SIZE, "events.seq": {"$ne": event["seq"]}},
+                {
+                    "$push": {"events": event},
+                    "$setOnInsert": {"created_at": event["timestamp"]}
+                },
+                upsert=True
+            )
+            for event in events
+        ], ordered=False)
+    except BulkWriteError as e:
+        if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])) or e.details.get("writeConcernErrors"):
+            raise
+
+async def append_timeline_events(request_doc: dict, events: List[dict]):
+    """Write events into their request_events buckets.
+    
+    request_doc is the parent as returned after the update that reserved the
+    events' sequence numbers, so its event_count already includes them. The
+    parent update has already committed by now, so a failure here is retried
+    and then logged rather than failing the request; load_timeline restores
+    the latest event from the parent's last_event if it never landed.
+    """
+    start = request_doc["event_count"] - len(events)
+    sequenced = [dict(event, seq=start + offset) for offset, event in enumerate(events)]
+    
+    for attempt in range(TIMELINE_APPEND_ATTEMPTS):
+        try:
+            await write_timeline_events(request_doc["id"], sequenced)
+            return
+        except PyMongoError as e:
+            if attempt == TIMELINE_APPEND_ATTEMPTS - 1:
+                logger.error(f"Failed to append timeline events {start}..{start + len(events) - 1} of request {request_doc['id']}: {str(e)}")
+                return
+            await asyncio.sleep(0.1 * (attempt + 1))
+
+def legacy_timeline(request_doc: dict) -> List[dict]:
+    """Embedded timeline entries, numbered so they sort before bucketed events"""
+    entries = request_doc.get("timeline") or []
+    return [dict(entry, seq=index - len(entries)) for index, entry in enumerate(entries)]
+
+async def load_timeline(request_doc: dict) -> List[dict]:
+    """Full timeline: legacy embedded entries followed by bucketed events.
+    
+    If the newest reserved event is missing (its append failed after the
+    parent committed), it is rebuilt from the parent's last_event and written
+    back. Older gaps cannot be recovered and are only logged.
+    """
+    events = legacy_timeline(request_doc)
+    buckets = await db.request_events.find(
+        {"request_id": request_doc["id"]},
+        {"_id": 0, "events": 1}
+    ).sort("bucket", ASCENDING).to_list(None)
+    stored = sorted((event for bucket in buckets for event in bucket["events"]), key=lambda e: e["seq"])
+    
+    event_count = request_doc.get("event_count") or 0
+    if len(stored) < event_count:
+        seqs = {event["seq"] for event in stored}
+        last_seq = event_count - 1
+        if last_seq not in seqs and request_doc.get("last_event"):
+            repaired = dict(request_doc["last_event"], seq=last_seq)
+            await write_timeline_events(request_doc["id"], [repaired])
+            stored.append(repaired)
+            seqs.add(last_seq)
+        if len(seqs) < event_count:
+            logger.warning(f"Timeline of request {request_doc['id']} is missing {event_count - len(seqs)} event(s)")
+    
+    return events + stored
+
+async def fetch_timeline_page(request_doc: dict, limit: int, cursor: Optional[str], response: Response) -> List[dict]:
+    """Fetch one page of a request's timeline, oldest first.
+    
+    The cursor is the seq of the last event returned; only the buckets that can
+    hold the next page are read. When more events remain, the next cursor is
+    returned in the X-Next-Cursor response header.
+    """
+    legacy = legacy_timeline(request_doc)
+    after = -len(legacy) - 1
+    if cursor:
+        try:
+            after = int(json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8'))))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    events = [event for event in legacy if event["seq"] > after][:limit + 1]
+    remaining = limit + 1 - len(events)
+    if remaining > 0:
+        first_bucket = max(after + 1, 0) // TIMELINE_BUCKET_SIZE
+        events += await db.request_events.aggregate([
+            {"$match": {"request_id": request_doc["id"], "bucket": {"$gte": first_bucket}}},
+            {"$sort": {"bucket": 1}},
+            {"$limit": remaining // TIMELINE_BUCKET_SIZE + 2},
+            {"$unwind": "$events"},
+            {"$replaceRoot": {"newRoot": "$events"}},
+            {"$match": {"seq": {"$gt": after}}},
+            {"$sort": {"seq": 1}},
+            {"$limit": remaining},
+        ]).to_list(None)
+    
+    if len(events) > limit:
+        events = events[:limit]
+        raw = json.dumps(events[-1]["seq"]).encode('utf-8')
+        response.headers["X-Next-Cursor"] = base64.urlsafe_b64encode(raw).decode('utf-8')
+    return events
+
+UPDATE_RETRIES = int(os.environ.get('UPDATE_RETRIES', '3'))
+
+def version_filter(version: int):
+    """Match a stored version; requests written before versioning have no field"""
+    if not version:
+        return {"$in": [0, None]}
+    return version
+
+async def apply_request_update(collection, request_id: str, expected_version: Optional[int], build_update):
+    """Apply a request update in a single find_one_and_update.
+    
+    build_update(request_doc) returns (updates, timeline_entries) for the current
+    document and may raise HTTPException. The write is guarded on the version that
+    was read: a concurrent change makes it miss, which is a 409 when the client sent
+    expected_version and otherwise rebuilds the update against the fresh document.
+    Timeline entries are appended to request_events once the parent is written.
+    Returns (request_doc, updated_request).
+    """
+    for _ in range(UPDATE_RETRIES):
+        request_doc = await collection.find_one({"id": request_id}, {"_id": 0})
+        if not request_doc:
+            raise HTTPException(status_code=404, detail="Request not found")
+        
+        version = request_doc.get("version", 0)
+        if expected_version is not None and expected_version != version:
+            raise HTTPException(status_code=409, detail="Request has been modified since it was loaded. Please refresh and try again.")
+        
+        updates, timeline_entries = build_update(request_doc)
+        update = {"$set": updates, "$inc": {"version": 1}}
+        if timeline_entries:
+            timeline_update(update, timeline_entries)
+        
+        updated_request = await collection.find_one_and_update(
+            {"id": request_id, "version": version_filter(version)},
+            update,
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if updated_request:
+            await bump_change_counter(collection.name)
+            if timeline_entries:
+                await append_timeline_events(updated_request, timeline_entries)
+            previous_staff_id = request_doc.get("assigned_staff_id")
+            if previous_staff_id and previous_staff_id != updated_request.get("assigned_staff_id"):
+                await record_deletion(collection.name, request_id, [previous_staff_id], "reassigned")
+            return request_doc, updated_request
+        if expected_version is not None:
+            raise HTTPException(status_code=409, detail="Request has been modified since it was loaded. Please refresh and try again.")
+    
+    raise HTTPException(status_code=409, detail="Request is being updated concurrently. Please try again.")
 
 # ==================== AUTH ROUTES ====================
 
@@ -578,13 +1302,14 @@ async def register(user_data: UserCreate):
         "id": user_id,
         "email": user_data.email,
         "full_name": user_data.full_name,
-        "password_hash": hash_password(user_data.password),
+        "password_hash": await hash_password(user_data.password),
         "role": "student",
         "created_at": now,
         "updated_at": now
     }
     
     await db.users.insert_one(user_doc)
+    invalidate_role_members("student")
     
     token = create_token(user_id, user_data.email, "student")
     
@@ -602,7 +1327,7 @@ async def register(user_data: UserCreate):
 @api_router.post("/auth/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user["password_hash"]):
+    if not user or not await verify_password(credentials.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     token = create_token(user["id"], user["email"], user["role"])
@@ -675,7 +1400,7 @@ async def forgot_password(request: PasswordResetRequest):
         </div>
     </div>
     """
-    await send_email_notification(request.email, "Password Reset Request", html_content)
+    await enqueue_email(request.email, "Password Reset Request", html_content)
     
     # For development: log the token
     logger.info(f"Password reset token for {request.email}: {reset_token}")
@@ -697,11 +1422,12 @@ async def reset_password(request: PasswordResetConfirm):
         raise HTTPException(status_code=400, detail="Reset token has expired")
     
     # Update user's password
-    new_password_hash = hash_password(request.new_password)
+    new_password_hash = await hash_password(request.new_password)
     await db.users.update_one(
         {"id": reset_record["user_id"]},
         {"$set": {"password_hash": new_password_hash, "updated_at": datetime.now(timezone.utc).isoformat()}}
     )
+    invalidate_cached_user(reset_record["user_id"])
     
     # Delete the used token
     await db.password_resets.delete_one({"token": request.token})
@@ -740,13 +1466,14 @@ async def create_user_by_admin(user_data: StaffCreateByAdmin, current_user: dict
         "id": user_id,
         "email": user_data.email,
         "full_name": user_data.full_name,
-        "password_hash": hash_password(user_data.password),
+        "password_hash": await hash_password(user_data.password),
         "role": user_data.role,
         "created_at": now,
         "updated_at": now
     }
     
     await db.users.insert_one(user_doc)
+    invalidate_role_members(user_data.role)
     
     return UserResponse(
         id=user_id,
@@ -757,11 +1484,16 @@ async def create_user_by_admin(user_data: StaffCreateByAdmin, current_user: dict
     )
 
 @api_router.get("/admin/users", response_model=List[UserResponse])
-async def get_all_users(current_user: dict = Depends(get_current_user)):
+async def get_all_users(
+    response: Response,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admins can view all users")
     
-    users = await db.users.find({}, {"_id": 0, "password_hash": 0}).to_list(1000)
+    users = await fetch_page(db.users, {}, {"_id": 0, "password_hash": 0}, limit, cursor, response)
     return [UserResponse(**u) for u in users]
 
 @api_router.get("/admin/staff", response_model=List[UserResponse])
@@ -783,6 +1515,8 @@ async def delete_user(user_id: str, current_user: dict = Depends(get_current_use
     result = await db.users.delete_one({"id": user_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_role_members()
+    invalidate_cached_user(user_id)
     
     return {"message": "User deleted successfully"}
 
@@ -803,11 +1537,12 @@ async def admin_reset_user_password(user_id: str, data: AdminResetPassword, curr
         raise HTTPException(status_code=404, detail="User not found")
     
     # Update password
-    new_password_hash = hash_password(data.new_password)
+    new_password_hash = await hash_password(data.new_password)
     await db.users.update_one(
         {"id": user_id},
         {"$set": {"password_hash": new_password_hash, "updated_at": datetime.now(timezone.utc).isoformat()}}
     )
+    invalidate_cached_user(user_id)
     
     # Send notification email to user
     html_content = f"""
@@ -827,7 +1562,7 @@ async def admin_reset_user_password(user_id: str, data: AdminResetPassword, curr
         </div>
     </div>
     """
-    await send_email_notification(user["email"], "Your Password Has Been Reset", html_content)
+    await enqueue_email(user["email"], "Your Password Has Been Reset", html_content)
     
     return {"message": f"Password reset successfully for {user['full_name']}"}
 
@@ -881,72 +1616,145 @@ async def create_transcript_request(request_data: TranscriptRequestCreate, curre
         "rejection_reason": None,
         "staff_notes": None,
         "documents": [],
-        "timeline": [timeline_entry],
+        "timeline": [],
+        "last_event": timeline_entry,
+        "event_count": 1,
+        "version": 1,
         "created_at": now,
         "updated_at": now
     }
     
+    doc.update(normalized_changes(normalize_transcript_data, doc))
+    doc["schema_version"] = SCHEMA_VERSIONS["transcript_requests"]
     await db.transcript_requests.insert_one(doc)
+    await bump_change_counter("transcript_requests")
+    await append_timeline_events(doc, [timeline_entry])
+    await update_analytics_rollup("transcript_requests", None, doc)
     
     # Notify admins
-    admins = await db.users.find({"role": "admin"}, {"_id": 0}).to_list(100)
-    for admin in admins:
-        await create_notification(
-            admin["id"],
-            "New Transcript Request",
-            f"New request from {current_user['full_name']}",
-            "new_request",
-            request_id
-        )
+    await notify_role(
+        "admin",
+        "New Transcript Request",
+        f"New request from {current_user['full_name']}",
+        "new_request",
+        request_id
+    )
     
-    return TranscriptRequestResponse(**doc)
+    return TranscriptRequestResponse(**{**doc, "timeline": [dict(timeline_entry, seq=0)]})
 
-@api_router.get("/requests", response_model=List[TranscriptRequestResponse])
-async def get_requests(current_user: dict = Depends(get_current_user)):
-    if current_user["role"] == "student":
-        # Students can only see their own requests
-        requests = await db.transcript_requests.find(
-            {"student_id": current_user["id"]},
-            {"_id": 0}
-        ).sort("created_at", -1).to_list(1000)
-    elif current_user["role"] == "staff":
-        # Staff can see assigned requests
-        requests = await db.transcript_requests.find(
-            {"assigned_staff_id": current_user["id"]},
-            {"_id": 0}
-        ).sort("created_at", -1).to_list(1000)
-    else:
-        # Admin can see all requests
-        requests = await db.transcript_requests.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+@api_router.get("/requests", response_model=List[TranscriptRequestSummary])
+async def get_requests(
+    request: Request,
+    response: Response,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    query = request_scope(current_user)
+    selected, projection = list_projection(TranscriptRequestSummary, fields)
+    watermark = await scope_watermark(db.transcript_requests, query, "updated_at")
+    not_modified = check_not_modified(
+        request, response, weak_etag("transcript_requests", query, watermark, limit, cursor, fields)
+    )
+    if not_modified:
+        return not_modified
+    
+    requests = await fetch_page(db.transcript_requests, query, projection, limit, cursor, response)
     
     # Normalize data for backward compatibility
     normalized_requests = [normalize_transcript_data(r) for r in requests]
-    return [TranscriptRequestResponse(**r) for r in normalized_requests]
+    if fields:
+        return sparse_response(normalized_requests, selected, response)
+    return list_response(TRANSCRIPT_SUMMARY_LIST, normalized_requests, response)
 
-@api_router.get("/requests/all", response_model=List[TranscriptRequestResponse])
-async def get_all_requests(current_user: dict = Depends(get_current_user)):
+@api_router.get("/requests/all", response_model=List[TranscriptRequestSummary])
+async def get_all_requests(
+    request: Request,
+    response: Response,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
     if current_user["role"] not in ["admin", "staff"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    requests = await db.transcript_requests.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    selected, projection = list_projection(TranscriptRequestSummary, fields)
+    watermark = await scope_watermark(db.transcript_requests, {}, "updated_at")
+    not_modified = check_not_modified(
+        request, response, weak_etag("transcript_requests", {}, watermark, limit, cursor, fields)
+    )
+    if not_modified:
+        return not_modified
+    
+    requests = await fetch_page(db.transcript_requests, {}, projection, limit, cursor, response)
     # Normalize data for backward compatibility
     normalized_requests = [normalize_transcript_data(r) for r in requests]
-    return [TranscriptRequestResponse(**r) for r in normalized_requests]
+    if fields:
+        return sparse_response(normalized_requests, selected, response)
+    return list_response(TRANSCRIPT_SUMMARY_LIST, normalized_requests, response)
+
+@api_router.get("/requests/changes", response_model=TranscriptRequestChanges)
+async def get_request_changes(
+    since: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    """Requests created or updated since a watermark, plus tombstones.
+    
+    Pass the returned watermark as since= on the next call; keep calling while
+    has_more is true.
+    """
+    _, projection = list_projection(TranscriptRequestSummary, None)
+    page = await fetch_changes(db.transcript_requests, request_scope(current_user), projection, current_user, since, limit)
+    page["changes"] = [normalize_transcript_data(r) for r in page["changes"]]
+    return Response(
+        content=TranscriptRequestChanges.model_validate(page).model_dump_json(),
+        media_type="application/json"
+    )
 
 @api_router.get("/requests/{request_id}", response_model=TranscriptRequestResponse)
-async def get_request(request_id: str, current_user: dict = Depends(get_current_user)):
+async def get_request(
+    request_id: str,
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_user)
+):
+    etag = await detail_etag(db.transcript_requests, request_id, current_user)
+    not_modified = check_not_modified(request, response, etag)
+    if not_modified:
+        return not_modified
+    
     request_doc = await db.transcript_requests.find_one({"id": request_id}, {"_id": 0})
     if not request_doc:
         raise HTTPException(status_code=404, detail="Request not found")
     
-    # Check permissions
-    if current_user["role"] == "student" and request_doc["student_id"] != current_user["id"]:
-        raise HTTPException(status_code=403, detail="You can only view your own requests")
+    request_doc["documents"] = await load_documents(request_doc)
+    request_doc["timeline"] = await load_timeline(request_doc)
     
     # Normalize data for backward compatibility
     normalized_request = normalize_transcript_data(request_doc)
     return TranscriptRequestResponse(**normalized_request)
 
+@api_router.get("/requests/{request_id}/timeline", response_model=List[dict])
+async def get_request_timeline(
+    request_id: str,
+    response: Response,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    request_doc = await db.transcript_requests.find_one({"id": request_id}, {"_id": 0, "id": 1, "student_id": 1, "timeline": 1})
+    if not request_doc:
+        raise HTTPException(status_code=404, detail="Request not found")
+    
+    # Check permissions
+    if current_user["role"] == "student" and request_doc["student_id"] != current_user["id"]:
+        raise HTTPException(status_code=403, detail="You can only view your own requests")
+    
+    return await fetch_timeline_page(request_doc, limit, cursor, response)
+
 class StudentRequestUpdate(BaseModel):
     first_name: Optional[str] = None
     middle_name: Optional[str] = None
@@ -993,6 +1801,8 @@ async def student_edit_request(request_id: str, update_data: StudentRequestUpdat
     for field, value in update_fields.items():
         if value is not None:
             updates[field] = value
+    # Keep the legacy/derived fields in step so the stored document stays normalized
+    updates.update(normalized_changes(normalize_transcript_data, {**request_doc, **updates}))
     
     # Add timeline entry for edit
     timeline_entry = {
@@ -1002,15 +1812,19 @@ async def student_edit_request(request_id: str, update_data: StudentRequestUpdat
         "updated_by": current_user["full_name"]
     }
     
-    await db.transcript_requests.update_one(
-        {"id": request_id},
-        {
-            "$set": updates,
-            "$push": {"timeline": timeline_entry}
-        }
+    updated_request = await db.transcript_requests.find_one_and_update(
+        {"id": request_id, "status": request_doc["status"]},
+        timeline_update({"$set": updates, "$inc": {"version": 1}}, [timeline_entry]),
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
-    
-    updated_request = await db.transcript_requests.find_one({"id": request_id}, {"_id": 0})
+    if not updated_request:
+        raise HTTPException(status_code=409, detail="Request status changed while editing. Please refresh and try again.")
+    await bump_change_counter("transcript_requests")
+    await append_timeline_events(updated_request, [timeline_entry])
+    await update_analytics_rollup("transcript_requests", request_doc, updated_request)
+    updated_request["documents"] = await load_documents(updated_request)
+    updated_request["timeline"] = await load_timeline(updated_request)
     return TranscriptRequestResponse(**updated_request)
 
 @api_router.patch("/requests/{request_id}", response_model=TranscriptRequestResponse)
@@ -1018,32 +1832,27 @@ async def update_request(request_id: str, update_data: TranscriptRequestUpdate,
     if current_user["role"] == "student":
         raise HTTPException(status_code=403, detail="Students cannot update request status")
     
-    request_doc = await db.transcript_requests.find_one({"id": request_id}, {"_id": 0})
-    if not request_doc:
-        raise HTTPException(status_code=404, detail="Request not found")
+    staff = None
+    if update_data.assigned_staff_id:
+        staff = await db.users.find_one({"id": update_data.assigned_staff_id}, {"_id": 0})
     
     now = datetime.now(timezone.utc).isoformat()
-    updates = {"updated_at": now}
-    
-    old_status = request_doc["status"]
-    
-    if update_data.status:
-        updates["status"] = update_data.status
-        # Use the provided note or create a default one
-        note_text = update_data.note if update_data.note else f"Status changed to {update_data.status}"
-        timeline_entry = {
-            "status": update_data.status,
-            "timestamp": now,
-            "note": note_text,
-            "updated_by": current_user["full_name"]
-        }
-        await db.transcript_requests.update_one(
-            {"id": request_id},
-            {"$push": {"timeline": timeline_entry}}
-        )
     
-    if update_data.assigned_staff_id:
-        staff = await db.users.find_one({"id": update_data.assigned_staff_id}, {"_id": 0})
+    def build_update(request_doc):
+        updates = {"updated_at": now}
+        timeline_entries = []
+        
+        if update_data.status:
+            updates["status"] = update_data.status
+            # Use the provided note or create a default one
+            note_text = update_data.note if update_data.note else f"Status changed to {update_data.status}"
+            timeline_entries.append({
+                "status": update_data.status,
+                "timestamp": now,
+                "note": note_text,
+                "updated_by": current_user["full_name"]
+            })
+        
         if staff:
             updates["assigned_staff_id"] = update_data.assigned_staff_id
             updates["assigned_staff_name"] = staff["full_name"]
@@ -1051,103 +1860,326 @@ async def update_request(request_id: str, update_data: TranscriptRequestUpdate,
             # Auto-update status to "In Progress" when staff is assigned
             if request_doc.get("status") == "Pending":
                 updates["status"] = "In Progress"
-                timeline_entry = {
+                timeline_entries.append({
                     "status": "In Progress",
                     "timestamp": now,
                     "note": "Request assigned to staff - Status automatically updated to In Progress",
                     "updated_by": current_user["full_name"]
-                }
-                await db.transcript_requests.update_one(
-                    {"id": request_id},
-                    {"$push": {"timeline": timeline_entry}}
-                )
-            
-            # Notify staff
-            await create_notification(
-                staff["id"],
-                "New Assignment",
-                f"You have been assigned a transcript request",
-                "assignment",
-                request_id
-            )
-    
-    if update_data.rejection_reason:
-        updates["rejection_reason"] = update_data.rejection_reason
-        updates["status"] = "Rejected"
-        timeline_entry = {
-            "status": "Rejected",
-            "timestamp": now,
-            "note": f"Request rejected: {update_data.rejection_reason}",
-            "updated_by": current_user["full_name"]
-        }
-        await db.transcript_requests.update_one(
-            {"id": request_id},
-            {"$push": {"timeline": timeline_entry}}
-        )
+                })
+        
+        if update_data.rejection_reason:
+            updates["rejection_reason"] = update_data.rejection_reason
+            updates["status"] = "Rejected"
+            timeline_entries.append({
+                "status": "Rejected",
+                "timestamp": now,
+                "note": f"Request rejected: {update_data.rejection_reason}",
+                "updated_by": current_user["full_name"]
+            })
+        
+        if update_data.staff_notes:
+            updates["staff_notes"] = update_data.staff_notes
+        
+        return updates, timeline_entries
     
-    if update_data.staff_notes:
-        updates["staff_notes"] = update_data.staff_notes
+    request_doc, updated_request = await apply_request_update(
+        db.transcript_requests, request_id, update_data.expected_version, build_update
+    )
+    old_status = request_doc["status"]
     
-    await db.transcript_requests.update_one({"id": request_id}, {"$set": updates})
+    if staff:
+        # Notify staff
+        await create_notification(
+            staff["id"],
+            "New Assignment",
+            f"You have been assigned a transcript request",
+            "assignment",
+            request_id
+        )
     
     # Notify student of status change
     if update_data.status and update_data.status != old_status:
-        updated_doc = await db.transcript_requests.find_one({"id": request_id}, {"_id": 0})
-        await notify_status_change(updated_doc, old_status, update_data.status)
+        await notify_status_change(updated_request, old_status, update_data.status)
     
-    updated_request = await db.transcript_requests.find_one({"id": request_id}, {"_id": 0})
+    await update_analytics_rollup("transcript_requests", request_doc, updated_request)
+    updated_request["documents"] = await load_documents(updated_request)
+    updated_request["timeline"] = await load_timeline(updated_request)
     return TranscriptRequestResponse(**updated_request)
 
 # ==================== FILE UPLOAD ====================
 
-@api_router.post("/requests/{request_id}/documents")
-async def upload_document(request_id: str, file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
-    if current_user["role"] not in ["admin", "staff"]:
-        raise HTTPException(status_code=403, detail="Only staff and admin can upload documents")
+UPLOAD_TOO_LARGE_DETAIL = f"File exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit"
+UPLOAD_PATH = re.compile(r"^/api/(requests|recommendations)/[^/]+/documents$")
+
+class UploadSizeLimitMiddleware:
+    """Reject oversized upload bodies before the multipart parser spools them.
     
-    request_doc = await db.transcript_requests.find_one({"id": request_id}, {"_id": 0})
-    if not request_doc:
-        raise HTTPException(status_code=404, detail="Request not found")
+    The form is parsed (and written to a temp file) before the route runs, so
+    save_upload alone would only see the size after receiving all of it. A
+    declared Content-Length over the limit is refused without reading the
+    body; chunked bodies are counted as they arrive and cut off at the limit.
+    """
+    def __init__(self, app):
+        self.app = app
     
-    # Validate file type
-    allowed_types = [
-        "application/pdf",
-        "application/msword",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        "image/jpeg",
-        "image/png",
-        "image/gif"
-    ]
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not UPLOAD_PATH.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        
+        limit = MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD_BYTES
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(status_code=413, content={"detail": UPLOAD_TOO_LARGE_DETAIL})
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI re-raises HTTPExceptions from body parsing as-is
+                    raise HTTPException(status_code=413, detail=UPLOAD_TOO_LARGE_DETAIL)
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Identify an allowed file type from its leading magic bytes"""
+    if head.startswith(b"%PDF-"):
+        return "application/pdf"
+    if head.startswith(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"):
+        # OLE2 compound file (legacy .doc)
+        return "application/msword"
+    if head.startswith(b"PK\x03\x04"):
+        # Any ZIP container; save_upload confirms it is a .docx once written
+        return DOCX_MEDIA_TYPE
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return None
+
+def is_docx(path: Path) -> bool:
+    """A ZIP is only a .docx if it holds a Word main document part"""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            names = set(archive.namelist())
+    except zipfile.BadZipFile:
+        return False
+    return "[Content_Types].xml" in names and "word/document.xml" in names
+
+def blob_path(sha256: str) -> Path:
+    """Two levels of fan-out keep every directory small"""
+    return BLOB_DIR / sha256[:2] / sha256[2:4] / sha256
+
+async def acquire_blob(sha256: str, size: int, content_type: str):
+    """Take a reference on a blob record, creating it if needed.
     
-    if file.content_type not in allowed_types:
-        raise HTTPException(status_code=400, detail="File type not allowed")
+    A record being deleted by release_blob (deleting_at set) cannot be
+    referenced; the upsert then collides on _id and we wait for the delete to
+    finish, so a new reference never lands on a file that is being unlinked.
+    """
+    now = datetime.now(timezone.utc)
+    stale = (now - timedelta(seconds=BLOB_DELETE_STALE_SECONDS)).isoformat()
+    update = {
+        "$inc": {"refcount": 1},
+        "$unset": {"deleting_at": ""},
+        "$setOnInsert": {"size": size, "content_type": content_type, "created_at": now.isoformat()}
+    }
+    for attempt in range(BLOB_ACQUIRE_ATTEMPTS):
+        try:
+            await db.blobs.update_one(
+                {"_id": sha256, "$or": [{"deleting_at": {"$exists": False}}, {"deleting_at": {"$lt": stale}}]},
+                update,
+                upsert=True
+            )
+            return
+        except DuplicateKeyError:
+            # An identical upload inserted the record first (the retry matches
+            # it) or the blob is being deleted (the retry waits for it to go)
+            await asyncio.sleep(0.05 * (attempt + 1))
+    raise HTTPException(status_code=503, detail="File storage is busy, please try again shortly")
+
+async def release_blob(sha256: str):
+    """Drop a reference; releasing the last one deletes the blob file and record"""
+    blob = await db.blobs.find_one_and_update(
+        {"_id": sha256},
+        {"$inc": {"refcount": -1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not blob or blob["refcount"] > 0:
+        return
     
-    # Save file
+    # Claim the delete while still unreferenced, blocking new references until the file is gone
+    claimed = await db.blobs.find_one_and_update(
+        {"_id": sha256, "refcount": {"$lte": 0}, "deleting_at": {"$exists": False}},
+        {"$set": {"deleting_at": datetime.now(timezone.utc).isoformat()}}
+    )
+    if not claimed:
+        return
+    try:
+        await aiofiles.os.remove(blob_path(sha256))
+    except FileNotFoundError:
+        pass
+    await db.blobs.delete_one({"_id": sha256, "refcount": {"$lte": 0}})
+
+async def store_blob(tmp_path: Path, sha256: str, size: int, content_type: str) -> Path:
+    """Move a fully written temp file into the blob store and take a reference.
+    
+    If a blob with the same hash already exists the temp file is discarded,
+    so duplicate uploads cost no extra disk. The caller owns the reference and
+    must hand it to a documents record (create_document_record) or release it.
+    """
+    await acquire_blob(sha256, size, content_type)
+    
+    path = blob_path(sha256)
+    try:
+        if await aiofiles.os.path.exists(path):
+            await aiofiles.os.remove(tmp_path)
+        else:
+            await aiofiles.os.makedirs(path.parent, exist_ok=True)
+            await aiofiles.os.replace(tmp_path, path)
+    except BaseException:
+        await release_blob(sha256)
+        raise
+    return path
+
+async def save_upload(file: UploadFile) -> dict:
+    """Stream an upload into the blob store in fixed-size chunks.
+    
+    The size limit is enforced mid-stream (the raw request body is already
+    capped by UploadSizeLimitMiddleware), the content type comes only from the
+    file's magic bytes and never from the client, and the SHA-256 is computed
+    on the fly. The blob only appears in the store once fully written.
+    """
     file_id = str(uuid.uuid4())
-    file_ext = Path(file.filename).suffix
-    file_path = UPLOAD_DIR / f"{file_id}{file_ext}"
+    tmp_path = UPLOAD_TMP_DIR / f"{file_id}.part"
+    digest = hashlib.sha256()
+    size = 0
+    content_type = None
     
-    content = await file.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if size == 0:
+                    content_type = sniff_content_type(chunk)
+                    if not content_type:
+                        raise HTTPException(status_code=400, detail="File content does not match an allowed file type")
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=UPLOAD_TOO_LARGE_DETAIL)
+                digest.update(chunk)
+                await out.write(chunk)
+        
+        if size == 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+        if content_type == DOCX_MEDIA_TYPE and not await asyncio.to_thread(is_docx, tmp_path):
+            raise HTTPException(status_code=400, detail="File content does not match an allowed file type")
+        
+        sha256 = digest.hexdigest()
+        file_path = await store_blob(tmp_path, sha256, size, content_type)
+    except BaseException:
+        try:
+            await aiofiles.os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
     
-    now = datetime.now(timezone.utc).isoformat()
-    doc_entry = {
+    return {
         "id": file_id,
-        "filename": file.filename,
-        "content_type": file.content_type,
         "path": str(file_path),
-        "uploaded_by": current_user["full_name"],
+        "size": size,
+        "sha256": sha256,
+        "content_type": content_type
+    }
+
+# Fields of a documents record that are only used for lookup and authorization
+DOCUMENT_PROJECTION = {"_id": 0, "parent_type": 0, "parent_id": 0, "owner_id": 0}
+
+async def create_document_record(parent_type: str, request_doc: dict, stored: dict, filename: str, uploaded_by: str, now: str) -> dict:
+    """Record an uploaded file in the documents collection and return its public entry.
+    
+    The record takes over the blob reference from save_upload; if it cannot be
+    written the reference is released instead.
+    """
+    doc_entry = {
+        "id": stored["id"],
+        "filename": filename,
+        "content_type": stored["content_type"],
+        "path": stored["path"],
+        "size": stored["size"],
+        "sha256": stored["sha256"],
+        "uploaded_by": uploaded_by,
         "uploaded_at": now
     }
+    try:
+        await db.documents.insert_one({
+            **doc_entry,
+            "parent_type": parent_type,
+            "parent_id": request_doc["id"],
+            "owner_id": request_doc["student_id"]
+        })
+    except BaseException:
+        await release_blob(stored["sha256"])
+        raise
+    return doc_entry
+
+async def remove_document_record(document_id: str):
+    """Delete a documents record and release its blob reference"""
+    doc = await db.documents.find_one_and_delete({"id": document_id}, {"_id": 0, "sha256": 1})
+    if doc and doc.get("sha256"):
+        await release_blob(doc["sha256"])
+
+async def record_document_upload(collection, request_id: str, doc_entry: dict, timeline_entry: dict, now: str):
+    """Bump the parent request for a new document, removing the document if that fails"""
+    try:
+        updated_request = await collection.find_one_and_update(
+            {"id": request_id},
+            timeline_update({"$set": {"updated_at": now}, "$inc": {"version": 1}}, [timeline_entry]),
+            projection={"_id": 0, "id": 1, "event_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated_request:
+            raise HTTPException(status_code=404, detail="Request not found")
+    except BaseException:
+        await remove_document_record(doc_entry["id"])
+        raise
+    await bump_change_counter(collection.name)
+    await append_timeline_events(updated_request, [timeline_entry])
+
+async def load_documents(request_doc: dict) -> List[dict]:
+    """Legacy embedded entries followed by entries from the documents collection"""
+    documents = list(request_doc.get("documents") or [])
+    documents += await db.documents.find(
+        {"parent_id": request_doc["id"]},
+        DOCUMENT_PROJECTION
+    ).sort("uploaded_at", ASCENDING).to_list(None)
+    return documents
+
+@api_router.post("/requests/{request_id}/documents")
+async def upload_document(request_id: str, file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+    if current_user["role"] not in ["admin", "staff"]:
+        raise HTTPException(status_code=403, detail="Only staff and admin can upload documents")
     
-    await db.transcript_requests.update_one(
-        {"id": request_id},
-        {
-            "$push": {"documents": doc_entry},
-            "$set": {"updated_at": now}
-        }
-    )
+    request_doc = await db.transcript_requests.find_one({"id": request_id}, {"_id": 0})
+    if not request_doc:
+        raise HTTPException(status_code=404, detail="Request not found")
+    
+    # Stream to disk, validating type and size as we go
+    stored = await save_upload(file)
+    
+    now = datetime.now(timezone.utc).isoformat()
+    doc_entry = await create_document_record("transcript", request_doc, stored, file.filename, current_user["full_name"], now)
     
     # Add timeline entry
     timeline_entry = {
@@ -1156,10 +2188,7 @@ async def upload_document(request_id: str, file: UploadFile = File(...), current
         "note": f"Document uploaded: {file.filename}",
         "updated_by": current_user["full_name"]
     }
-    await db.transcript_requests.update_one(
-        {"id": request_id},
-        {"$push": {"timeline": timeline_entry}}
-    )
+    await record_document_upload(db.transcript_requests, request_id, doc_entry, timeline_entry, now)
     
     # Notify student
     await create_notification(
@@ -1172,32 +2201,131 @@ async def upload_document(request_id: str, file: UploadFile = File(...), current
     
     return {"message": "Document uploaded successfully", "document": doc_entry}
 
-@api_router.get("/documents/{document_id}")
-async def get_document(document_id: str, current_user: dict = Depends(get_current_user)):
-    # Find the request containing this document
-    request_doc = await db.transcript_requests.find_one(
-        {"documents.id": document_id},
-        {"_id": 0}
-    )
+async def find_document(document_id: str, current_user: dict) -> dict:
+    """Resolve a document entry the current user is allowed to read"""
+    doc = await db.documents.find_one({"id": document_id}, {"_id": 0})
     
-    if not request_doc:
+    if not doc:
+        # Legacy uploads are still embedded in their parent request
+        for collection in [db.transcript_requests, db.recommendation_requests]:
+            request_doc = await collection.find_one(
+                {"documents.id": document_id},
+                {"_id": 0, "student_id": 1, "documents": {"$elemMatch": {"id": document_id}}}
+            )
+            if request_doc and request_doc.get("documents"):
+                doc = {**request_doc["documents"][0], "owner_id": request_doc["student_id"]}
+                break
+    
+    if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
     # Check permissions
-    if current_user["role"] == "student" and request_doc["student_id"] != current_user["id"]:
+    if current_user["role"] == "student" and doc["owner_id"] != current_user["id"]:
         raise HTTPException(status_code=403, detail="Access denied")
+    return doc
+
+def parse_range_header(range_header: str, size: int) -> Optional[tuple]:
+    """Parse a single 'bytes=' range into inclusive (start, end).
     
-    # Find the document
-    doc = next((d for d in request_doc["documents"] if d["id"] == document_id), None)
-    if not doc:
-        raise HTTPException(status_code=404, detail="Document not found")
+    Returns None when the header should be ignored (multiple ranges or
+    another unit) and raises 416 when the range cannot be satisfied.
+    """
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    
+    if not match.group(1):
+        # Suffix range: the last N bytes
+        suffix = int(match.group(2))
+        if suffix == 0:
+            start = size
+        else:
+            start = max(size - suffix, 0)
+        end = size - 1
+    else:
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+async def iter_file(file_path: Path, start: int, length: int):
+    async with aiofiles.open(file_path, "rb") as f:
+        await f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = await f.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+@api_router.get("/documents/{document_id}/download")
+async def download_document(document_id: str, request: Request, current_user: dict = Depends(get_current_user)):
+    """Stream a document as binary with ETag revalidation and byte-range support"""
+    doc = await find_document(document_id, current_user)
+    
+    file_path = Path(doc["path"])
+    try:
+        stat_result = await aiofiles.os.stat(file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found on server")
+    size = stat_result.st_size
+    
+    # Stored files are never rewritten in place, so the upload hash (or, for
+    # older uploads, size + mtime) identifies the content
+    if doc.get("sha256"):
+        etag = f'"{doc["sha256"]}"'
+    else:
+        etag = f'"{document_id}-{size:x}-{stat_result.st_mtime_ns:x}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(doc.get('filename') or 'download')}"
+    }
+    
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = parse_range_header(range_header, size)
+    
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        status_code = 206
+    else:
+        start, end = 0, size - 1
+        status_code = 200
+    headers["Content-Length"] = str(end - start + 1)
+    
+    return StreamingResponse(
+        iter_file(file_path, start, end - start + 1),
+        status_code=status_code,
+        media_type=doc["content_type"],
+        headers=headers
+    )
+
+@api_router.get("/documents/{document_id}")
+async def get_document(document_id: str, current_user: dict = Depends(get_current_user)):
+    """Base64-in-JSON download kept for existing clients; prefer /download"""
+    doc = await find_document(document_id, current_user)
     
     file_path = Path(doc["path"])
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found on server")
     
-    with open(file_path, "rb") as f:
-        content = base64.b64encode(f.read()).decode('utf-8')
+    async with aiofiles.open(file_path, "rb") as f:
+        content = base64.b64encode(await f.read()).decode('utf-8')
     
     return {
         "filename": doc["filename"],
@@ -1256,72 +2384,145 @@ async def create_recommendation_request(request_data: RecommendationRequestCreat
         "rejection_reason": None,
         "staff_notes": None,
         "documents": [],
-        "timeline": [timeline_entry],
+        "timeline": [],
+        "last_event": timeline_entry,
+        "event_count": 1,
+        "version": 1,
         "created_at": now,
         "updated_at": now
     }
     
+    doc.update(normalized_changes(normalize_recommendation_data, doc))
+    doc["schema_version"] = SCHEMA_VERSIONS["recommendation_requests"]
     await db.recommendation_requests.insert_one(doc)
+    await bump_change_counter("recommendation_requests")
+    await append_timeline_events(doc, [timeline_entry])
+    await update_analytics_rollup("recommendation_requests", None, doc)
     
     # Notify admins
-    admins = await db.users.find({"role": "admin"}, {"_id": 0}).to_list(100)
-    for admin in admins:
-        await create_notification(
-            admin["id"],
-            "New Recommendation Letter Request",
-            f"New recommendation letter request from {current_user['full_name']}",
-            "new_recommendation",
-            request_id
-        )
+    await notify_role(
+        "admin",
+        "New Recommendation Letter Request",
+        f"New recommendation letter request from {current_user['full_name']}",
+        "new_recommendation",
+        request_id
+    )
     
-    return RecommendationRequestResponse(**doc)
+    return RecommendationRequestResponse(**{**doc, "timeline": [dict(timeline_entry, seq=0)]})
 
-@api_router.get("/recommendations", response_model=List[RecommendationRequestResponse])
-async def get_recommendation_requests(current_user: dict = Depends(get_current_user)):
-    if current_user["role"] == "student":
-        # Students can only see their own requests
-        requests = await db.recommendation_requests.find(
-            {"student_id": current_user["id"]},
-            {"_id": 0}
-        ).sort("created_at", -1).to_list(1000)
-    elif current_user["role"] == "staff":
-        # Staff can see assigned requests
-        requests = await db.recommendation_requests.find(
-            {"assigned_staff_id": current_user["id"]},
-            {"_id": 0}
-        ).sort("created_at", -1).to_list(1000)
-    else:
-        # Admin can see all requests
-        requests = await db.recommendation_requests.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+@api_router.get("/recommendations", response_model=List[RecommendationRequestSummary])
+async def get_recommendation_requests(
+    request: Request,
+    response: Response,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    query = request_scope(current_user)
+    selected, projection = list_projection(RecommendationRequestSummary, fields)
+    watermark = await scope_watermark(db.recommendation_requests, query, "updated_at")
+    not_modified = check_not_modified(
+        request, response, weak_etag("recommendation_requests", query, watermark, limit, cursor, fields)
+    )
+    if not_modified:
+        return not_modified
+    
+    requests = await fetch_page(db.recommendation_requests, query, projection, limit, cursor, response)
     
     # Normalize data for backward compatibility
     normalized_requests = [normalize_recommendation_data(r) for r in requests]
-    return [RecommendationRequestResponse(**r) for r in normalized_requests]
+    if fields:
+        return sparse_response(normalized_requests, selected, response)
+    return list_response(RECOMMENDATION_SUMMARY_LIST, normalized_requests, response)
 
-@api_router.get("/recommendations/all", response_model=List[RecommendationRequestResponse])
-async def get_all_recommendation_requests(current_user: dict = Depends(get_current_user)):
+@api_router.get("/recommendations/all", response_model=List[RecommendationRequestSummary])
+async def get_all_recommendation_requests(
+    request: Request,
+    response: Response,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
     if current_user["role"] not in ["admin", "staff"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    requests = await db.recommendation_requests.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    selected, projection = list_projection(RecommendationRequestSummary, fields)
+    watermark = await scope_watermark(db.recommendation_requests, {}, "updated_at")
+    not_modified = check_not_modified(
+        request, response, weak_etag("recommendation_requests", {}, watermark, limit, cursor, fields)
+    )
+    if not_modified:
+        return not_modified
+    
+    requests = await fetch_page(db.recommendation_requests, {}, projection, limit, cursor, response)
     # Normalize data for backward compatibility
     normalized_requests = [normalize_recommendation_data(r) for r in requests]
-    return [RecommendationRequestResponse(**r) for r in normalized_requests]
+    if fields:
+        return sparse_response(normalized_requests, selected, response)
+    return list_response(RECOMMENDATION_SUMMARY_LIST, normalized_requests, response)
+
+@api_router.get("/recommendations/changes", response_model=RecommendationRequestChanges)
+async def get_recommendation_changes(
+    since: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    """Requests created or updated since a watermark, plus tombstones.
+    
+    Pass the returned watermark as since= on the next call; keep calling while
+    has_more is true.
+    """
+    _, projection = list_projection(RecommendationRequestSummary, None)
+    page = await fetch_changes(db.recommendation_requests, request_scope(current_user), projection, current_user, since, limit)
+    page["changes"] = [normalize_recommendation_data(r) for r in page["changes"]]
+    return Response(
+        content=RecommendationRequestChanges.model_validate(page).model_dump_json(),
+        media_type="application/json"
+    )
 
 @api_router.get("/recommendations/{request_id}", response_model=RecommendationRequestResponse)
-async def get_recommendation_request(request_id: str, current_user: dict = Depends(get_current_user)):
+async def get_recommendation_request(
+    request_id: str,
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_user)
+):
+    etag = await detail_etag(db.recommendation_requests, request_id, current_user)
+    not_modified = check_not_modified(request, response, etag)
+    if not_modified:
+        return not_modified
+    
     request_doc = await db.recommendation_requests.find_one({"id": request_id}, {"_id": 0})
     if not request_doc:
         raise HTTPException(status_code=404, detail="Request not found")
     
-    # Check permissions
-    if current_user["role"] == "student" and request_doc["student_id"] != current_user["id"]:
-        raise HTTPException(status_code=403, detail="You can only view your own requests")
+    request_doc["documents"] = await load_documents(request_doc)
+    request_doc["timeline"] = await load_timeline(request_doc)
     
     # Normalize data for backward compatibility
     normalized_request = normalize_recommendation_data(request_doc)
     return RecommendationRequestResponse(**normalized_request)
 
+@api_router.get("/recommendations/{request_id}/timeline", response_model=List[dict])
+async def get_recommendation_timeline(
+    request_id: str,
+    response: Response,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    request_doc = await db.recommendation_requests.find_one({"id": request_id}, {"_id": 0, "id": 1, "student_id": 1, "timeline": 1})
+    if not request_doc:
+        raise HTTPException(status_code=404, detail="Request not found")
+    
+    # Check permissions
+    if current_user["role"] == "student" and request_doc["student_id"] != current_user["id"]:
+        raise HTTPException(status_code=403, detail="You can only view your own requests")
+    
+    return await fetch_timeline_page(request_doc, limit, cursor, response)
+
 @api_router.put("/recommendations/{request_id}/edit", response_model=RecommendationRequestResponse)
 async def student_edit_recommendation(request_id: str, update_data: StudentRecommendationUpdate, current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "student":
@@ -1350,6 +2551,8 @@ async def student_edit_recommendation(request_id: str, update_data: StudentRecom
     for field, value in update_fields.items():
         if value is not None:
             updates[field] = value
+    # Keep the legacy/derived fields in step so the stored document stays normalized
+    updates.update(normalized_changes(normalize_recommendation_data, {**request_doc, **updates}))
     
     # Add timeline entry for edit
     timeline_entry = {
@@ -1359,58 +2562,57 @@ async def student_edit_recommendation(request_id: str, update_data: StudentRecom
         "updated_by": current_user["full_name"]
     }
     
-    await db.recommendation_requests.update_one(
-        {"id": request_id},
-        {
-            "$set": updates,
-            "$push": {"timeline": timeline_entry}
-        }
+    updated_request = await db.recommendation_requests.find_one_and_update(
+        {"id": request_id, "status": request_doc["status"]},
+        timeline_update({"$set": updates, "$inc": {"version": 1}}, [timeline_entry]),
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
-    
-    updated_request = await db.recommendation_requests.find_one({"id": request_id}, {"_id": 0})
+    if not updated_request:
+        raise HTTPException(status_code=409, detail="Request status changed while editing. Please refresh and try again.")
+    await bump_change_counter("recommendation_requests")
+    await append_timeline_events(updated_request, [timeline_entry])
+    await update_analytics_rollup("recommendation_requests", request_doc, updated_request)
+    updated_request["documents"] = await load_documents(updated_request)
+    updated_request["timeline"] = await load_timeline(updated_request)
     normalized_request = normalize_recommendation_data(updated_request)
     return RecommendationRequestResponse(**normalized_request)
 
 @api_router.patch("/recommendations/{request_id}", response_model=RecommendationRequestResponse)
 async def update_recommendation_request(request_id: str, update_data: RecommendationRequestUpdate, current_user: dict = Depends(get_current_user)):
-    # Allow students to update their own pending recommendations
-    request_doc = await db.recommendation_requests.find_one({"id": request_id}, {"_id": 0})
-    if not request_doc:
-        raise HTTPException(status_code=404, detail="Request not found")
+    # Students cannot change status, assign staff, or reject
+    if current_user["role"] == "student" and (update_data.status or update_data.assigned_staff_id or update_data.rejection_reason):
+        raise HTTPException(status_code=403, detail="Students cannot update request status or assignments")
     
-    # Check permissions
-    if current_user["role"] == "student":
-        # Students can only update their own requests and only if status is Pending or In Progress
-        if request_doc["student_id"] != current_user["id"]:
-            raise HTTPException(status_code=403, detail="You can only update your own requests")
-        if request_doc["status"] not in ["Pending", "In Progress"]:
-            raise HTTPException(status_code=403, detail=f"You cannot edit requests at the '{request_doc['status']}' stage. Please contact administration for assistance.")
-        # Students cannot change status, assign staff, or reject
-        if update_data.status or update_data.assigned_staff_id or update_data.rejection_reason:
-            raise HTTPException(status_code=403, detail="Students cannot update request status or assignments")
+    staff = None
+    if update_data.assigned_staff_id:
+        staff = await db.users.find_one({"id": update_data.assigned_staff_id}, {"_id": 0})
     
     now = datetime.now(timezone.utc).isoformat()
-    updates = {"updated_at": now}
-    
-    old_status = request_doc["status"]
-    
-    if update_data.status:
-        updates["status"] = update_data.status
-        # Use the provided note or create a default one
-        note_text = update_data.note if update_data.note else f"Status changed to {update_data.status}"
-        timeline_entry = {
-            "status": update_data.status,
-            "timestamp": now,
-            "note": note_text,
-            "updated_by": current_user["full_name"]
-        }
-        await db.recommendation_requests.update_one(
-            {"id": request_id},
-            {"$push": {"timeline": timeline_entry}}
-        )
     
-    if update_data.assigned_staff_id:
-        staff = await db.users.find_one({"id": update_data.assigned_staff_id}, {"_id": 0})
+    def build_update(request_doc):
+        # Allow students to update their own pending recommendations
+        if current_user["role"] == "student":
+            # Students can only update their own requests and only if status is Pending or In Progress
+            if request_doc["student_id"] != current_user["id"]:
+                raise HTTPException(status_code=403, detail="You can only update your own requests")
+            if request_doc["status"] not in ["Pending", "In Progress"]:
+                raise HTTPException(status_code=403, detail=f"You cannot edit requests at the '{request_doc['status']}' stage. Please contact administration for assistance.")
+        
+        updates = {"updated_at": now}
+        timeline_entries = []
+        
+        if update_data.status:
+            updates["status"] = update_data.status
+            # Use the provided note or create a default one
+            note_text = update_data.note if update_data.note else f"Status changed to {update_data.status}"
+            timeline_entries.append({
+                "status": update_data.status,
+                "timestamp": now,
+                "note": note_text,
+                "updated_by": current_user["full_name"]
+            })
+        
         if staff:
             updates["assigned_staff_id"] = update_data.assigned_staff_id
             updates["assigned_staff_name"] = staff["full_name"]
@@ -1418,81 +2620,79 @@ async def update_recommendation_request(request_id: str, update_data: Recommenda
             # Auto-update status to "In Progress" when staff is assigned
             if request_doc.get("status") == "Pending":
                 updates["status"] = "In Progress"
-                timeline_entry = {
+                timeline_entries.append({
                     "status": "In Progress",
                     "timestamp": now,
                     "note": "Request assigned to staff - Status automatically updated to In Progress",
                     "updated_by": current_user["full_name"]
-                }
-                await db.recommendation_requests.update_one(
-                    {"id": request_id},
-                    {"$push": {"timeline": timeline_entry}}
-                )
-            
-            # Notify staff
-            await create_notification(
-                staff["id"],
-                "New Recommendation Assignment",
-                f"You have been assigned a recommendation letter request",
-                "recommendation_assignment",
-                request_id
-            )
-    
-    if update_data.rejection_reason:
-        updates["rejection_reason"] = update_data.rejection_reason
-        updates["status"] = "Rejected"
-        timeline_entry = {
-            "status": "Rejected",
-            "timestamp": now,
-            "note": f"Request rejected: {update_data.rejection_reason}",
-            "updated_by": current_user["full_name"]
-        }
-        await db.recommendation_requests.update_one(
-            {"id": request_id},
-            {"$push": {"timeline": timeline_entry}}
-        )
-    
-    if update_data.staff_notes:
-        updates["staff_notes"] = update_data.staff_notes
+                })
+        
+        if update_data.rejection_reason:
+            updates["rejection_reason"] = update_data.rejection_reason
+            updates["status"] = "Rejected"
+            timeline_entries.append({
+                "status": "Rejected",
+                "timestamp": now,
+                "note": f"Request rejected: {update_data.rejection_reason}",
+                "updated_by": current_user["full_name"]
+            })
+        
+        if update_data.staff_notes:
+            updates["staff_notes"] = update_data.staff_notes
+        
+        if update_data.co_curricular_activities is not None:
+            updates["co_curricular_activities"] = update_data.co_curricular_activities
+        
+        # Allow students to update their own pending requests
+        if current_user["role"] == "student":
+            # Update fields students can modify
+            if update_data.first_name: updates["first_name"] = update_data.first_name
+            if update_data.middle_name is not None: updates["middle_name"] = update_data.middle_name
+            if update_data.last_name: updates["last_name"] = update_data.last_name
+            if update_data.email: updates["email"] = update_data.email
+            if update_data.phone_number: updates["phone_number"] = update_data.phone_number
+            if update_data.address: updates["address"] = update_data.address
+            if update_data.years_attended: 
+                updates["years_attended"] = update_data.years_attended
+                # Create string version for backward compatibility
+                updates["years_attended_str"] = ", ".join([f"{y.get('from_year', '')}-{y.get('to_year', '')}" for y in update_data.years_attended if isinstance(y, dict)])
+            if update_data.enrollment_status: updates["enrollment_status"] = update_data.enrollment_status
+            if update_data.last_form_class: updates["last_form_class"] = update_data.last_form_class
+            if update_data.institution_name: updates["institution_name"] = update_data.institution_name
+            if update_data.institution_address: updates["institution_address"] = update_data.institution_address
+            if update_data.directed_to: updates["directed_to"] = update_data.directed_to
+            if update_data.program_name: updates["program_name"] = update_data.program_name
+            if update_data.needed_by_date: updates["needed_by_date"] = update_data.needed_by_date
+            if update_data.collection_method: updates["collection_method"] = update_data.collection_method
+            if update_data.delivery_address is not None: updates["delivery_address"] = update_data.delivery_address
+            if update_data.co_curricular_activities is not None: updates["co_curricular_activities"] = update_data.co_curricular_activities
+        
+        return updates, timeline_entries
     
-    if update_data.co_curricular_activities is not None:
-        updates["co_curricular_activities"] = update_data.co_curricular_activities
+    request_doc, updated_request = await apply_request_update(
+        db.recommendation_requests, request_id, update_data.expected_version, build_update
+    )
+    old_status = request_doc["status"]
     
-    # Allow students to update their own pending requests
-    if current_user["role"] == "student":
-        # Update fields students can modify
-        if update_data.first_name: updates["first_name"] = update_data.first_name
-        if update_data.middle_name is not None: updates["middle_name"] = update_data.middle_name
-        if update_data.last_name: updates["last_name"] = update_data.last_name
-        if update_data.email: updates["email"] = update_data.email
-        if update_data.phone_number: updates["phone_number"] = update_data.phone_number
-        if update_data.address: updates["address"] = update_data.address
-        if update_data.years_attended: 
-            updates["years_attended"] = update_data.years_attended
-            # Create string version for backward compatibility
-            updates["years_attended_str"] = ", ".join([f"{y.get('from_year', '')}-{y.get('to_year', '')}" for y in update_data.years_attended if isinstance(y, dict)])
-        if update_data.enrollment_status: updates["enrollment_status"] = update_data.enrollment_status
-        if update_data.last_form_class: updates["last_form_class"] = update_data.last_form_class
-        if update_data.institution_name: updates["institution_name"] = update_data.institution_name
-        if update_data.institution_address: updates["institution_address"] = update_data.institution_address
-        if update_data.directed_to: updates["directed_to"] = update_data.directed_to
-        if update_data.program_name: updates["program_name"] = update_data.program_name
-        if update_data.needed_by_date: updates["needed_by_date"] = update_data.needed_by_date
-        if update_data.collection_method: updates["collection_method"] = update_data.collection_method
-        if update_data.delivery_address is not None: updates["delivery_address"] = update_data.delivery_address
-        if update_data.co_curricular_activities is not None: updates["co_curricular_activities"] = update_data.co_curricular_activities
-    
-    await db.recommendation_requests.update_one({"id": request_id}, {"$set": updates})
+    if staff:
+        # Notify staff
+        await create_notification(
+            staff["id"],
+            "New Recommendation Assignment",
+            f"You have been assigned a recommendation letter request",
+            "recommendation_assignment",
+            request_id
+        )
     
     # Notify student of status change
     if update_data.status and update_data.status != old_status:
-        student = await db.users.find_one({"id": request_doc["student_id"]}, {"_id": 0})
-        if student:
-            title = "Recommendation Request Status Updated"
-            message = f"Your recommendation letter request has been updated from '{old_status}' to '{update_data.status}'."
-            await create_notification(student["id"], title, message, "recommendation_status_update", request_id)
+        title = "Recommendation Request Status Updated"
+        message = f"Your recommendation letter request has been updated from '{old_status}' to '{update_data.status}'."
+        await create_notification(request_doc["student_id"], title, message, "recommendation_status_update", request_id)
     
-    updated_request = await db.recommendation_requests.find_one({"id": request_id}, {"_id": 0})
+    await update_analytics_rollup("recommendation_requests", request_doc, updated_request)
+    updated_request["documents"] = await load_documents(updated_request)
+    updated_request["timeline"] = await load_timeline(updated_request)
     normalized_request = normalize_recommendation_data(updated_request)
     return RecommendationRequestResponse(**normalized_request)
 
@@ -1505,45 +2705,11 @@ async def upload_recommendation_document(request_id: str, file: UploadFile = Fil
     if not request_doc:
         raise HTTPException(status_code=404, detail="Request not found")
     
-    # Validate file type
-    allowed_types = [
-        "application/pdf",
-        "application/msword",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        "image/jpeg",
-        "image/png",
-        "image/gif"
-    ]
-    
-    if file.content_type not in allowed_types:
-        raise HTTPException(status_code=400, detail="File type not allowed")
-    
-    # Save file
-    file_id = str(uuid.uuid4())
-    file_ext = Path(file.filename).suffix
-    file_path = UPLOAD_DIR / f"{file_id}{file_ext}"
-    
-    content = await file.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
+    # Stream to disk, validating type and size as we go
+    stored = await save_upload(file)
     
     now = datetime.now(timezone.utc).isoformat()
-    doc_entry = {
-        "id": file_id,
-        "filename": file.filename,
-        "content_type": file.content_type,
-        "path": str(file_path),
-        "uploaded_by": current_user["full_name"],
-        "uploaded_at": now
-    }
-    
-    await db.recommendation_requests.update_one(
-        {"id": request_id},
-        {
-            "$push": {"documents": doc_entry},
-            "$set": {"updated_at": now}
-        }
-    )
+    doc_entry = await create_document_record("recommendation", request_doc, stored, file.filename, current_user["full_name"], now)
     
     # Add timeline entry
     timeline_entry = {
@@ -1552,10 +2718,7 @@ async def upload_recommendation_document(request_id: str, file: UploadFile = Fil
         "note": f"Document uploaded: {file.filename}",
         "updated_by": current_user["full_name"]
     }
-    await db.recommendation_requests.update_one(
-        {"id": request_id},
-        {"$push": {"timeline": timeline_entry}}
-    )
+    await record_document_upload(db.recommendation_requests, request_id, doc_entry, timeline_entry, now)
     
     # Notify student
     await create_notification(
@@ -1571,11 +2734,29 @@ async def upload_recommendation_document(request_id: str, file: UploadFile = Fil
 # ==================== NOTIFICATIONS ====================
 
 @api_router.get("/notifications", response_model=List[NotificationResponse])
-async def get_notifications(current_user: dict = Depends(get_current_user)):
-    notifications = await db.notifications.find(
-        {"user_id": current_user["id"]},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
+async def get_notifications(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    query = {"user_id": current_user["id"]}
+    watermark = await notification_watermark(current_user["id"])
+    not_modified = check_not_modified(
+        request, response, weak_etag("notifications", query, watermark, limit, cursor)
+    )
+    if not_modified:
+        return not_modified
+    
+    notifications = await fetch_page(
+        db.notifications,
+        query,
+        {"_id": 0},
+        limit,
+        cursor,
+        response
+    )
     
     return [NotificationResponse(**n) for n in notifications]
 
@@ -1595,6 +2776,7 @@ async def mark_notification_read(notification_id: str, current_user: dict = Depe
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Notification not found")
+    publish_local_unread(current_user["id"])
     return {"message": "Notification marked as read"}
 
 @api_router.patch("/notifications/read-all")
@@ -1603,206 +2785,887 @@ async def mark_all_notifications_read(current_user: dict = Depends(get_current_u
         {"user_id": current_user["id"], "read": False},
         {"$set": {"read": True}}
     )
+    publish_local_unread(current_user["id"])
     return {"message": "All notifications marked as read"}
 
-# ==================== ANALYTICS ====================
+# ==================== NOTIFICATION STREAM ====================
 
-@api_router.get("/analytics", response_model=AnalyticsResponse)
-async def get_analytics(current_user: dict = Depends(get_current_user)):
-    if current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Only admins can view analytics")
+NOTIFICATION_STREAM_MAX_CONNECTIONS = int(os.environ.get('NOTIFICATION_STREAM_MAX_CONNECTIONS', '500'))
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = int(os.environ.get('NOTIFICATION_STREAM_HEARTBEAT_SECONDS', '15'))
+NOTIFICATION_STREAM_REPLAY_BATCH_SIZE = int(os.environ.get('NOTIFICATION_STREAM_REPLAY_BATCH_SIZE', '100'))
+NOTIFICATION_STREAM_QUEUE_SIZE = int(os.environ.get('NOTIFICATION_STREAM_QUEUE_SIZE', '100'))
+NOTIFICATION_STREAM_TOKEN_SECONDS = int(os.environ.get('NOTIFICATION_STREAM_TOKEN_SECONDS', '60'))
+NOTIFICATION_STREAM_AUDIENCE = "notification_stream"
+NOTIFICATION_WATCH_RETRY_SECONDS = 5
+
+# user_id -> subscribers ({"queue", "overflow"}) of the streams open on this worker
+notification_subscribers = {}
+# "change_stream" while the MongoDB watcher is running; "local" means only this
+# worker's own writes are published, and one shared recount per heartbeat picks
+# up unread changes made on other workers
+notification_stream_stats = {"mode": "local", "connections": 0, "rejected": 0, "overflows": 0, "recounts": 0}
+
+def create_stream_token(user_id: str) -> str:
+    payload = {
+        "sub": user_id,
+        "aud": NOTIFICATION_STREAM_AUDIENCE,
+        "exp": datetime.now(timezone.utc) + timedelta(seconds=NOTIFICATION_STREAM_TOKEN_SECONDS)
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+async def get_stream_user(stream_token: str = Query(...)):
+    """Authenticate a stream from ?stream_token=, since EventSource cannot send headers.
+    
+    Stream tokens expire within NOTIFICATION_STREAM_TOKEN_SECONDS and carry their
+    own audience, so a URL that ends up in an access log is useless elsewhere:
+    decode_token rejects them as API tokens, and access tokens are rejected here.
+    """
+    try:
+        payload = jwt.decode(stream_token, JWT_SECRET, algorithms=[JWT_ALGORITHM], audience=NOTIFICATION_STREAM_AUDIENCE)
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Stream token expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid stream token")
+    return await get_token_user(payload["sub"])
+
+def dispatch_notification_event(user_id: str, event: tuple):
+    for subscriber in notification_subscribers.get(user_id, ()):
+        try:
+            subscriber["queue"].put_nowait(event)
+        except asyncio.QueueFull:
+            # The stream closes and the client replays from Last-Event-ID on reconnect
+            subscriber["overflow"] = True
+            notification_stream_stats["overflows"] += 1
+
+def publish_local_notifications(notifications: List[dict]):
+    """Feed this worker's streams directly when no change stream is running"""
+    if notification_stream_stats["mode"] != "local":
+        return
+    for notification in notifications:
+        dispatch_notification_event(notification["user_id"], ("notification", notification))
+
+def publish_local_unread(user_id: str):
+    if notification_stream_stats["mode"] != "local":
+        return
+    dispatch_notification_event(user_id, ("unread", None))
+
+async def watch_notifications():
+    """Fan notification inserts and read-flag updates out to open streams.
+    
+    Every worker runs one change stream and dispatches only to its own
+    subscribers. A standalone server (no replica set) cannot open one, so the
+    worker stays on in-process publishing for its lifetime.
+    """
+    resume_token = None
+    while True:
+        try:
+            async with db.notifications.watch(
+                [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}],
+                full_document="updateLookup",
+                resume_after=resume_token
+            ) as stream:
+                notification_stream_stats["mode"] = "change_stream"
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    doc = change.get("fullDocument")
+                    if not doc or doc.get("user_id") not in notification_subscribers:
+                        continue
+                    if change["operationType"] == "insert":
+                        dispatch_notification_event(doc["user_id"], ("notification", doc))
+                    else:
+                        dispatch_notification_event(doc["user_id"], ("unread", None))
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            notification_stream_stats["mode"] = "local"
+            if e.code == 40573:
+                logger.info("Change streams need a replica set; notification streams use in-process events")
+                return
+            # e.g. the resume point fell off the oplog - start from now
+            logger.warning(f"Notification change stream failed: {str(e)}")
+            resume_token = None
+        except PyMongoError as e:
+            notification_stream_stats["mode"] = "local"
+            logger.warning(f"Notification change stream interrupted: {str(e)}")
+        await asyncio.sleep(NOTIFICATION_WATCH_RETRY_SECONDS)
+
+async def recount_unread_notifications():
+    """Push unread counts to open streams while no change stream is running.
+    
+    One aggregate per heartbeat covers every user with a stream on this worker,
+    instead of each stream counting on its own.
+    """
+    while True:
+        await asyncio.sleep(NOTIFICATION_STREAM_HEARTBEAT_SECONDS)
+        if notification_stream_stats["mode"] != "local" or not notification_subscribers:
+            continue
+        
+        user_ids = list(notification_subscribers)
+        try:
+            rows = await db.notifications.aggregate([
+                {"$match": {"user_id": {"$in": user_ids}, "read": False}},
+                {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+            ]).to_list(len(user_ids))
+        except PyMongoError as e:
+            logger.warning(f"Unread recount failed: {str(e)}")
+            continue
+        
+        counts = {row["_id"]: row["count"] for row in rows}
+        notification_stream_stats["recounts"] += 1
+        for user_id in user_ids:
+            dispatch_notification_event(user_id, ("unread_count", counts.get(user_id, 0)))
+
+@app.on_event("startup")
+async def start_notification_watcher():
+    app.state.notification_watchers = [
+        asyncio.create_task(watch_notifications()),
+        asyncio.create_task(recount_unread_notifications())
+    ]
+
+def sse_event(event: str, data: str, event_id: Optional[str] = None) -> str:
+    lines = [f"id: {event_id}"] if event_id else []
+    lines += [f"event: {event}", f"data: {data}"]
+    return "\n".join(lines) + "\n\n"
+
+def notification_sse_event(notification: dict) -> str:
+    # The (created_at, id) cursor doubles as the Last-Event-ID to replay from
+    return sse_event(
+        "notification",
+        NotificationResponse(**notification).model_dump_json(),
+        encode_cursor(notification)
+    )
+
+async def notification_events(user_id: str, last_event: Optional[tuple]):
+    subscriber = {"queue": asyncio.Queue(maxsize=NOTIFICATION_STREAM_QUEUE_SIZE), "overflow": False}
+    notification_subscribers.setdefault(user_id, []).append(subscriber)
+    notification_stream_stats["connections"] += 1
+    try:
+        yield f"retry: {NOTIFICATION_WATCH_RETRY_SECONDS * 1000}\n\n"
+        
+        # Subscribed first, so anything inserted during the replay is queued
+        # too; the client de-duplicates by notification id. The replay pages
+        # until it has caught up, since live events would otherwise move
+        # Last-Event-ID past whatever was left
+        while last_event:
+            created_at, doc_id = last_event
+            missed = await db.notifications.find(
+                {"user_id": user_id, "$or": [
+                    {"created_at": {"$gt": created_at}},
+                    {"created_at": created_at, "id": {"$gt": doc_id}}
+                ]},
+                {"_id": 0}
+            ).sort([("created_at", ASCENDING), ("id", ASCENDING)]).limit(NOTIFICATION_STREAM_REPLAY_BATCH_SIZE).to_list(NOTIFICATION_STREAM_REPLAY_BATCH_SIZE)
+            for notification in missed:
+                yield notification_sse_event(notification)
+            last_event = (missed[-1]["created_at"], missed[-1]["id"]) if len(missed) == NOTIFICATION_STREAM_REPLAY_BATCH_SIZE else None
+        
+        unread = await db.notifications.count_documents({"user_id": user_id, "read": False})
+        yield sse_event("unread", json.dumps({"count": unread}))
+        
+        while True:
+            try:
+                events = [await asyncio.wait_for(subscriber["queue"].get(), NOTIFICATION_STREAM_HEARTBEAT_SECONDS)]
+            except asyncio.TimeoutError:
+                events = []
+            if subscriber["overflow"]:
+                return
+            
+            # Drain whatever else is queued so a burst costs one unread count
+            while not subscriber["queue"].empty():
+                events.append(subscriber["queue"].get_nowait())
+            for kind, payload in events:
+                if kind == "notification":
+                    yield notification_sse_event(payload)
+            
+            count = unread
+            if any(kind == "notification" or (kind == "unread" and payload is None) for kind, payload in events):
+                count = await db.notifications.count_documents({"user_id": user_id, "read": False})
+            else:
+                # Counts from the shared recount need no query of their own
+                for kind, payload in events:
+                    if kind == "unread_count":
+                        count = payload
+            if count != unread:
+                unread = count
+                yield sse_event("unread", json.dumps({"count": unread}))
+            if not events:
+                yield ": heartbeat\n\n"
+    finally:
+        notification_subscribers[user_id].remove(subscriber)
+        if not notification_subscribers[user_id]:
+            del notification_subscribers[user_id]
+        notification_stream_stats["connections"] -= 1
+
+@api_router.post("/notifications/stream-token")
+async def get_notification_stream_token(current_user: dict = Depends(get_current_user)):
+    """Short-lived token for opening /notifications/stream"""
+    return {
+        "token": create_stream_token(current_user["id"]),
+        "expires_in": NOTIFICATION_STREAM_TOKEN_SECONDS
+    }
+
+@api_router.get("/notifications/stream")
+async def stream_notifications(
+    request: Request,
+    last_event_id: Optional[str] = None,
+    current_user: dict = Depends(get_stream_user)
+):
+    """Server-sent events: notification (new notification) and unread (count).
+    
+    Authenticated with a token from POST /notifications/stream-token.
+    Reconnecting clients send Last-Event-ID (or ?last_event_id=) and receive
+    the notifications created since that event before live ones resume.
+    """
+    if notification_stream_stats["connections"] >= NOTIFICATION_STREAM_MAX_CONNECTIONS:
+        notification_stream_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Too many open notification streams, please try again shortly",
+            headers={"Retry-After": str(NOTIFICATION_WATCH_RETRY_SECONDS)}
+        )
+    
+    last_event_id = request.headers.get("last-event-id") or last_event_id
+    last_event = decode_cursor(last_event_id) if last_event_id else None
     
-    # Check and notify about overdue requests
-    await check_and_notify_overdue_requests()
+    return StreamingResponse(
+        notification_events(current_user["id"], last_event),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ==================== BACKGROUND JOBS ====================
+
+# Identifies this process when holding job leases (one per uvicorn worker)
+WORKER_ID = f"{os.uname().nodename}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+OVERDUE_SWEEP_SECONDS = int(os.environ.get('OVERDUE_SWEEP_SECONDS', '900'))
+OVERDUE_SWEEP_BATCH_SIZE = 500
+
+# name -> {"func": coroutine function, "interval": seconds}
+SCHEDULED_JOBS = {}
+
+def scheduled_job(name: str, interval_seconds: int):
+    """Register a coroutine to run every interval_seconds on exactly one worker.
     
+    The coroutine may return a dict of counts, which is recorded as part of
+    the job's last run.
+    """
+    def decorator(func):
+        SCHEDULED_JOBS[name] = {"func": func, "interval": interval_seconds}
+        return func
+    return decorator
+
+async def acquire_job_lease(name: str, ttl_seconds: int) -> bool:
+    """Take or renew the lease on a job; False if another worker holds it"""
     now = datetime.now(timezone.utc)
-    today_str = now.strftime("%Y-%m-%d")
+    try:
+        lease = await db.scheduled_jobs.find_one_and_update(
+            {"_id": name, "$or": [{"lease_expires_at": {"$lte": now}}, {"owner": WORKER_ID}]},
+            {"$set": {"owner": WORKER_ID, "lease_expires_at": now + timedelta(seconds=ttl_seconds)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # The lease document exists and is held by a live worker
+        return False
+    return lease is not None
+
+async def run_scheduled_job(name: str):
+    job = SCHEDULED_JOBS[name]
+    while True:
+        try:
+            # The lease outlives one interval so the owner renews it on its next tick,
+            # while a crashed owner is taken over within two intervals
+            if await acquire_job_lease(name, job["interval"] * 2):
+                started_at = datetime.now(timezone.utc)
+                started = time.monotonic()
+                last_run = {"started_at": started_at.isoformat(), "worker": WORKER_ID}
+                try:
+                    last_run["counts"] = await job["func"]() or {}
+                    last_run["error"] = None
+                except Exception as e:
+                    logger.error(f"Scheduled job {name} failed: {str(e)}")
+                    last_run["counts"] = {}
+                    last_run["error"] = str(e)
+                last_run["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+                await db.scheduled_jobs.update_one({"_id": name}, {"$set": {"last_run": last_run, "interval_seconds": job["interval"]}})
+        except Exception as e:
+            logger.error(f"Scheduler error for {name}: {str(e)}")
+        await asyncio.sleep(job["interval"])
+
+@app.on_event("startup")
+async def start_scheduler():
+    app.state.scheduler_tasks = [asyncio.create_task(run_scheduled_job(name)) for name in SCHEDULED_JOBS]
+
+@api_router.get("/admin/jobs")
+async def get_scheduled_jobs(current_user: dict = Depends(get_current_user)):
+    """Lease holder and last run (duration, counts, error) of each background job"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
     
-    # Use aggregation pipeline for optimized queries
-    pipeline = [
+    jobs = await db.scheduled_jobs.find({}).to_list(len(SCHEDULED_JOBS) + 10)
+    return [
         {
-            "$facet": {
-                "status_counts": [
-                    {"$group": {"_id": "$status", "count": {"$sum": 1}}}
-                ],
-                "enrollment_counts": [
-                    {"$group": {"_id": "$enrollment_status", "count": {"$sum": 1}}}
-                ],
-                "collection_counts": [
-                    {"$group": {"_id": "$collection_method", "count": {"$sum": 1}}}
-                ],
-                "total": [
-                    {"$count": "count"}
-                ],
-                "staff_workload": [
-                    {"$match": {"assigned_staff_id": {"$ne": None}}},
-                    {"$group": {"_id": "$assigned_staff_id", "count": {"$sum": 1}}}
-                ]
-            }
+            "name": job["_id"],
+            "owner": job.get("owner"),
+            "lease_expires_at": job["lease_expires_at"].isoformat() if job.get("lease_expires_at") else None,
+            "interval_seconds": job.get("interval_seconds"),
+            "last_run": job.get("last_run")
+        }
+        for job in jobs
+    ]
+
+@api_router.get("/admin/metrics")
+async def get_metrics(current_user: dict = Depends(get_current_user)):
+    """In-process cache metrics for this worker"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return {
+        "worker": WORKER_ID,
+        "user_cache": {**user_cache_stats, "size": len(_user_cache), "max_size": USER_CACHE_SIZE, "ttl_seconds": USER_CACHE_TTL_SECONDS},
+        "bcrypt": {
+            "workers": BCRYPT_WORKERS,
+            "pending": bcrypt_stats["pending"],
+            "max_pending": BCRYPT_MAX_PENDING,
+            "completed": bcrypt_stats["completed"],
+            "rejected": bcrypt_stats["rejected"],
+            "failed": bcrypt_stats["failed"],
+            "avg_ms": round(bcrypt_stats["total_ms"] / bcrypt_stats["completed"], 1) if bcrypt_stats["completed"] else 0,
+            "max_ms": round(bcrypt_stats["max_ms"], 1)
+        },
+        "reports": {
+            "workers": REPORT_WORKERS,
+            "pending": report_stats["pending"],
+            "max_pending": REPORT_MAX_PENDING,
+            "completed": report_stats["completed"],
+            "rejected": report_stats["rejected"],
+            "timeouts": report_stats["timeouts"],
+            "failed": report_stats["failed"],
+            "avg_ms": round(report_stats["total_ms"] / report_stats["completed"], 1) if report_stats["completed"] else 0,
+            "max_ms": round(report_stats["max_ms"], 1)
+        },
+        "notification_streams": {
+            **notification_stream_stats,
+            "max_connections": NOTIFICATION_STREAM_MAX_CONNECTIONS
         }
+    }
+
+def parse_needed_by_date(value: str):
+    """Parse a needed_by_date stored as YYYY-MM-DD or a full ISO timestamp"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).date()
+
+@scheduled_job("overdue_sweep", OVERDUE_SWEEP_SECONDS)
+async def check_and_notify_overdue_requests() -> dict:
+    """Notify admins once a day about each overdue transcript and recommendation request"""
+    now = datetime.now(timezone.utc)
+    today_str = now.strftime("%Y-%m-%d")
+    
+    admin_ids = await get_role_member_ids("admin")
+    counts = {"transcript_requests": 0, "recommendation_requests": 0, "notifications": 0}
+    
+    sweeps = [
+        ("transcript_requests", "⚠️ Overdue Transcript Request", "Request", "overdue"),
+        ("recommendation_requests", "⚠️ Overdue Recommendation Request", "Recommendation letter request", "recommendation_overdue"),
     ]
+    for collection_name, title, noun, notif_type in sweeps:
+        collection = db[collection_name]
+        notifications = []
+        marks = []
+        
+        async def flush():
+            if notifications:
+                await db.notifications.insert_many(notifications, ordered=False)
+                publish_local_notifications(notifications)
+                counts["notifications"] += len(notifications)
+                notifications.clear()
+            if marks:
+                await collection.bulk_write(marks, ordered=False)
+                marks.clear()
+        
+        # Find overdue requests that haven't been notified today
+        async for req in collection.find({
+            "needed_by_date": {"$lt": today_str, "$ne": ""},
+            "status": {"$nin": ["Completed", "Rejected"]},
+            "overdue_notified_date": {"$ne": today_str}
+        }, {"_id": 0, "id": 1, "first_name": 1, "last_name": 1, "needed_by_date": 1}):
+            try:
+                days_overdue = (now.date() - parse_needed_by_date(req["needed_by_date"])).days
+            except (ValueError, TypeError, AttributeError):
+                continue
+            if days_overdue <= 0:
+                continue
+            
+            student_name = f"{req.get('first_name', '')} {req.get('last_name', '')}"
+            message = f"{noun} from {student_name} is {days_overdue} day(s) overdue. Needed by: {req['needed_by_date']}"
+            for admin_id in admin_ids:
+                notifications.append(build_notification(admin_id, title, message, notif_type, req["id"]))
+            marks.append(UpdateOne({"id": req["id"]}, {"$set": {"overdue_notified_date": today_str}}))
+            counts[collection_name] += 1
+            
+            if len(marks) >= OVERDUE_SWEEP_BATCH_SIZE:
+                await flush()
+        await flush()
+    
+    return counts
+
+# ==================== EMAIL OUTBOX ====================
+
+# Handlers only enqueue; a pool of workers per process drains the outbox.
+# Without a Resend key emails are logged and dropped, as before the outbox;
+# EMAIL_TRANSPORT=local additionally keeps the most recent ones in memory
+EMAIL_TRANSPORT = os.environ.get('EMAIL_TRANSPORT', 'resend' if RESEND_API_KEY else 'log')
+EMAIL_WORKERS = int(os.environ.get('EMAIL_WORKERS', '2'))
+EMAIL_BATCH_SIZE = min(int(os.environ.get('EMAIL_BATCH_SIZE', '50')), 100)  # Resend batch API limit
+EMAIL_MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', '5'))
+EMAIL_RETRY_BASE_SECONDS = int(os.environ.get('EMAIL_RETRY_BASE_SECONDS', '30'))
+EMAIL_POLL_SECONDS = 30
+EMAIL_CLAIM_SECONDS = 300
+
+# Messages delivered by the local transport, for tests and development
+LOCAL_EMAIL_BUFFER_SIZE = int(os.environ.get('LOCAL_EMAIL_BUFFER_SIZE', '100'))
+local_sent_emails = deque(maxlen=LOCAL_EMAIL_BUFFER_SIZE)
+
+async def send_with_resend(messages: List[dict]):
+    params = [
+        {"from": SENDER_EMAIL, "to": [m["to"]], "subject": m["subject"], "html": m["html"]}
+        for m in messages
+    ]
+    await asyncio.to_thread(resend.Batch.send, params)
+
+async def send_with_log(messages: List[dict]):
+    for m in messages:
+        logger.info(f"Email not sent (no transport configured): '{m['subject']}' to {m['to']}")
+
+async def send_with_local(messages: List[dict]):
+    for m in messages:
+        local_sent_emails.append({"to": m["to"], "subject": m["subject"], "html": m["html"]})
+        logger.info(f"Local email transport: '{m['subject']}' to {m['to']}")
+
+EMAIL_TRANSPORTS = {"resend": send_with_resend, "log": send_with_log, "local": send_with_local}
+
+_email_wakeup = asyncio.Event()
+
+async def enqueue_email(to_email: str, subject: str, html_content: str):
+    """Queue an email for delivery by the outbox workers"""
+    now = datetime.now(timezone.utc)
+    await db.email_outbox.insert_one({
+        "id": str(uuid.uuid4()),
+        "to": to_email,
+        "subject": subject,
+        "html": html_content,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "last_error": None,
+        "created_at": now.isoformat()
+    })
+    _email_wakeup.set()
+
+async def claim_email_batch() -> List[dict]:
+    """Claim due messages, including ones whose previous claimant died mid-send"""
+    now = datetime.now(timezone.utc)
+    batch = []
+    while len(batch) < EMAIL_BATCH_SIZE:
+        message = await db.email_outbox.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "sending", "claimed_until": {"$lte": now}}
+            ]},
+            {"$set": {
+                "status": "sending",
+                "claimed_by": WORKER_ID,
+                "claimed_until": now + timedelta(seconds=EMAIL_CLAIM_SECONDS)
+            }},
+            sort=[("next_attempt_at", ASCENDING)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if not message:
+            break
+        batch.append(message)
+    return batch
+
+async def deliver_email_batch(batch: List[dict]):
+    try:
+        await EMAIL_TRANSPORTS[EMAIL_TRANSPORT](batch)
+    except Exception as e:
+        logger.error(f"Failed to send {len(batch)} email(s): {str(e)}")
+        now = datetime.now(timezone.utc)
+        operations = []
+        for message in batch:
+            attempts = message.get("attempts", 0) + 1
+            if attempts >= EMAIL_MAX_ATTEMPTS:
+                # Dead letter - kept for inspection, never retried automatically
+                update = {"status": "dead"}
+            else:
+                delay = EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+                update = {"status": "pending", "next_attempt_at": now + timedelta(seconds=delay)}
+            update.update({"attempts": attempts, "last_error": str(e)})
+            operations.append(UpdateOne({"id": message["id"]}, {"$set": update}))
+        await db.email_outbox.bulk_write(operations, ordered=False)
+        return
+    
+    await db.email_outbox.update_many(
+        {"id": {"$in": [m["id"] for m in batch]}},
+        {"$set": {"status": "sent", "sent_at": datetime.now(timezone.utc).isoformat()}, "$inc": {"attempts": 1}}
+    )
+
+async def email_worker():
+    while True:
+        try:
+            # Clear before claiming so an enqueue racing with the claim still wakes us
+            _email_wakeup.clear()
+            batch = await claim_email_batch()
+            if batch:
+                await deliver_email_batch(batch)
+                continue
+        except Exception as e:
+            logger.error(f"Email worker error: {str(e)}")
+        try:
+            await asyncio.wait_for(_email_wakeup.wait(), timeout=EMAIL_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+@app.on_event("startup")
+async def start_email_workers():
+    if EMAIL_TRANSPORT == "resend" and not RESEND_API_KEY:
+        logger.warning("Resend API key not configured, emails will stay queued")
+    app.state.email_workers = [asyncio.create_task(email_worker()) for _ in range(EMAIL_WORKERS)]
+
+@api_router.get("/admin/email-outbox")
+async def get_email_outbox_status(current_user: dict = Depends(get_current_user)):
+    """Outbox counts by status and the most recent dead letters"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    status_counts = await db.email_outbox.aggregate([
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]).to_list(10)
+    dead_letters = await db.email_outbox.find(
+        {"status": "dead"},
+        {"_id": 0, "html": 0}
+    ).sort("created_at", -1).to_list(20)
     
-    result = await db.transcript_requests.aggregate(pipeline).to_list(1)
+    for message in dead_letters:
+        for field in ["next_attempt_at", "claimed_until"]:
+            if isinstance(message.get(field), datetime):
+                message[field] = message[field].isoformat()
     
-    # Calculate overdue requests (needed_by_date < today and status not Completed/Rejected)
-    overdue_requests = await db.transcript_requests.find({
+    return {
+        "transport": EMAIL_TRANSPORT,
+        "counts": {item["_id"]: item["count"] for item in status_counts},
+        "dead_letters": dead_letters
+    }
+
+# ==================== ANALYTICS ROLLUPS ====================
+
+ROLLUP_ID = "global"
+ROLLUP_COLLECTIONS = ["transcript_requests", "recommendation_requests"]
+ROLLUP_DIMENSIONS = ["status", "enrollment_status", "collection_method"]
+ANALYTICS_RECONCILE_SECONDS = int(os.environ.get('ANALYTICS_RECONCILE_SECONDS', '300'))
+
+# (upper bound in days, label) - None means unbounded
+TRANSCRIPT_OVERDUE_BUCKETS = [(3, "1-3 days"), (7, "4-7 days"), (14, "8-14 days"), (None, "15+ days")]
+RECOMMENDATION_OVERDUE_BUCKETS = [(7, "1-7 days"), (14, "8-14 days"), (30, "15-30 days"), (None, "30+ days")]
+
+def rollup_key(value) -> str:
+    """Make a field value safe to use as a key in a rollup document path"""
+    key = str(value).replace(".", "_").lstrip("$") if value not in (None, "") else ""
+    return key or "unknown"
+
+def overdue_bucket(days_overdue: int, buckets: list) -> str:
+    for upper, label in buckets:
+        if upper is None or days_overdue <= upper:
+            return label
+
+async def update_analytics_rollup(collection_name: str, before: Optional[dict], after: Optional[dict]):
+    """Apply the counter delta between two versions of a request to the rollup.
+    
+    Pass before=None for a newly created request and after=None for a deleted
+    one. Only runs once the rollup exists; until then the next read or
+    reconcile builds it from scratch.
+    """
+    inc = {}
+    staff_names = {}
+    
+    def add(doc: dict, sign: int):
+        keys = [f"{collection_name}.total"]
+        for dimension in ROLLUP_DIMENSIONS:
+            keys.append(f"{collection_name}.{dimension}.{rollup_key(doc.get(dimension))}")
+        if doc.get("assigned_staff_id"):
+            keys.append(f"{collection_name}.assigned_staff_id.{rollup_key(doc['assigned_staff_id'])}")
+        else:
+            keys.append(f"{collection_name}.unassigned")
+        keys.append(f"{collection_name}.created_month.{rollup_key((doc.get('created_at') or '')[:7])}")
+        for key in keys:
+            inc[key] = inc.get(key, 0) + sign
+    
+    if before:
+        add(before, -1)
+    if after:
+        add(after, 1)
+        if after.get("assigned_staff_id") and after.get("assigned_staff_name"):
+            staff_names[f"staff_names.{rollup_key(after['assigned_staff_id'])}"] = after["assigned_staff_name"]
+    
+    inc = {k: v for k, v in inc.items() if v}
+    if not inc and not staff_names:
+        return
+    
+    update = {}
+    if inc:
+        update["$inc"] = inc
+    if staff_names:
+        update["$set"] = staff_names
+    try:
+        await db.analytics_rollups.update_one({"_id": ROLLUP_ID}, update)
+    except Exception as e:
+        # The periodic reconciler repairs any drift
+        logger.error(f"Failed to update analytics rollup: {str(e)}")
+
+async def compute_collection_rollup(collection) -> dict:
+    """Count one request collection along every rollup dimension"""
+    facets = {
+        dimension: [{"$group": {"_id": f"${dimension}", "count": {"$sum": 1}}}]
+        for dimension in ROLLUP_DIMENSIONS
+    }
+    facets["assigned_staff_id"] = [
+        {"$match": {"assigned_staff_id": {"$ne": None}}},
+        {"$group": {"_id": "$assigned_staff_id", "count": {"$sum": 1}}}
+    ]
+    facets["created_month"] = [
+        {"$group": {"_id": {"$substrBytes": [{"$ifNull": ["$created_at", ""]}, 0, 7]}, "count": {"$sum": 1}}}
+    ]
+    result = await collection.aggregate([{"$facet": facets}]).to_list(1)
+    data = result[0] if result else {}
+    
+    rollup = {}
+    for name in ROLLUP_DIMENSIONS + ["assigned_staff_id", "created_month"]:
+        counts = {}
+        for item in data.get(name, []):
+            key = rollup_key(item["_id"])
+            counts[key] = counts.get(key, 0) + item["count"]
+        rollup[name] = counts
+    rollup["total"] = sum(rollup["status"].values())
+    rollup["unassigned"] = rollup["total"] - sum(rollup["assigned_staff_id"].values())
+    return rollup
+
+async def compute_overdue_rollup(now: datetime) -> dict:
+    """Overdue counts depend on the current date, so they are only refreshed by the reconciler"""
+    today_str = now.strftime("%Y-%m-%d")
+    
+    transcript_count = 0
+    transcript_by_days = {}
+    async for req in db.transcript_requests.find({
         "needed_by_date": {"$lt": today_str},
         "status": {"$nin": ["Completed", "Rejected"]}
-    }).to_list(None)
-    overdue_count = len(overdue_requests)
-    
-    # Calculate overdue by days categories
-    overdue_by_days = {"1-3 days": 0, "4-7 days": 0, "8-14 days": 0, "15+ days": 0}
-    for req in overdue_requests:
+    }, {"_id": 0, "needed_by_date": 1}):
+        transcript_count += 1
         try:
             needed_date = datetime.strptime(req["needed_by_date"], "%Y-%m-%d")
             days_overdue = (now.replace(tzinfo=None) - needed_date).days
-            if days_overdue <= 3:
-                overdue_by_days["1-3 days"] += 1
-            elif days_overdue <= 7:
-                overdue_by_days["4-7 days"] += 1
-            elif days_overdue <= 14:
-                overdue_by_days["8-14 days"] += 1
-            else:
-                overdue_by_days["15+ days"] += 1
-        except:
+            label = overdue_bucket(days_overdue, TRANSCRIPT_OVERDUE_BUCKETS)
+            transcript_by_days[label] = transcript_by_days.get(label, 0) + 1
+        except (ValueError, TypeError):
             pass
     
-    overdue_by_days_list = [{"name": k, "value": v, "color": "#ef4444" if "15+" in k else "#f97316" if "8-14" in k else "#eab308" if "4-7" in k else "#fbbf24"} for k, v in overdue_by_days.items() if v > 0]
+    recommendation_count = 0
+    recommendation_by_days = {}
+    async for req in db.recommendation_requests.find({
+        "status": {"$nin": ["Completed", "Rejected"]},
+        "needed_by_date": {"$nin": [None, ""]}
+    }, {"_id": 0, "needed_by_date": 1}):
+        try:
+            needed_date = parse_needed_by_date(req["needed_by_date"])
+        except (ValueError, TypeError, AttributeError):
+            continue
+        if needed_date < now.date():
+            recommendation_count += 1
+            label = overdue_bucket((now.date() - needed_date).days, RECOMMENDATION_OVERDUE_BUCKETS)
+            recommendation_by_days[label] = recommendation_by_days.get(label, 0) + 1
     
-    # Parse aggregation results
-    if result:
-        data = result[0]
-        
-        # Get total
-        total = data["total"][0]["count"] if data["total"] else 0
-        
-        # Parse status counts
-        status_map = {item["_id"]: item["count"] for item in data["status_counts"]}
-        pending = status_map.get("Pending", 0)
-        in_progress = status_map.get("In Progress", 0)
-        processing = status_map.get("Processing", 0)
-        ready = status_map.get("Ready", 0)
-        completed = status_map.get("Completed", 0)
-        rejected = status_map.get("Rejected", 0)
-        
-        # Parse enrollment counts
-        enrollment_map = {item["_id"]: item["count"] for item in data["enrollment_counts"]}
-        requests_by_enrollment = [
-            {"name": "Enrolled", "value": enrollment_map.get("enrolled", 0)},
-            {"name": "Graduate", "value": enrollment_map.get("graduate", 0)},
-            {"name": "Withdrawn", "value": enrollment_map.get("withdrawn", 0)}
-        ]
-        
-        # Parse collection method counts
-        collection_map = {item["_id"]: item["count"] for item in data["collection_counts"]}
-        requests_by_collection_method = [
-            {"name": "Pickup at Bursary", "value": collection_map.get("pickup", 0)},
-            {"name": "Emailed to Institution", "value": collection_map.get("emailed", 0)},
-            {"name": "Physical Delivery", "value": collection_map.get("delivery", 0)}
-        ]
-        
-        # Parse staff workload - include both transcripts and recommendations
-        staff_workload_map = {item["_id"]: item["count"] for item in data["staff_workload"]}
-        
-        # Get recommendation staff workload
-        rec_staff_workload = await db.recommendation_requests.aggregate([
-            {"$match": {"assigned_staff_id": {"$ne": None}}},
-            {"$group": {"_id": "$assigned_staff_id", "count": {"$sum": 1}}}
-        ]).to_list(100)
-        
-        # Merge transcript and recommendation workloads
-        for item in rec_staff_workload:
-            staff_id = item["_id"]
-            if staff_id in staff_workload_map:
-                staff_workload_map[staff_id] += item["count"]
-            else:
-                staff_workload_map[staff_id] = item["count"]
-        
-        staff_workload = []
-        for staff_id, count in staff_workload_map.items():
-            staff = await db.users.find_one({"id": staff_id})
-            staff_name = staff["full_name"] if staff else "Unknown"
-            staff_workload.append({"name": staff_name, "requests": count})
-        
-        # Add unassigned count (both transcripts and recommendations)
-        unassigned_transcript_count = await db.transcript_requests.count_documents({
-            "$or": [{"assigned_staff_id": None}, {"assigned_staff_id": {"$exists": False}}]
-        })
-        unassigned_rec_count = await db.recommendation_requests.count_documents({
-            "$or": [{"assigned_staff_id": None}, {"assigned_staff_id": {"$exists": False}}]
-        })
-        total_unassigned = unassigned_transcript_count + unassigned_rec_count
-        if total_unassigned > 0:
-            staff_workload.append({"name": "Unassigned", "requests": total_unassigned})
-        
+    return {
+        "transcript_requests": {"count": transcript_count, "by_days": transcript_by_days},
+        "recommendation_requests": {"count": recommendation_count, "by_days": recommendation_by_days}
+    }
+
+async def rebuild_analytics_rollups() -> dict:
+    """Recompute the analytics rollup from the source collections and store it"""
+    now = datetime.now(timezone.utc)
+    rollup = {"_id": ROLLUP_ID}
+    for collection_name in ROLLUP_COLLECTIONS:
+        rollup[collection_name] = await compute_collection_rollup(db[collection_name])
+    rollup["overdue"] = await compute_overdue_rollup(now)
+    
+    staff_ids = set()
+    for collection_name in ROLLUP_COLLECTIONS:
+        staff_ids.update(rollup[collection_name]["assigned_staff_id"].keys())
+    staff_names = {}
+    async for staff in db.users.find({"id": {"$in": list(staff_ids)}}, {"_id": 0, "id": 1, "full_name": 1}):
+        staff_names[rollup_key(staff["id"])] = staff["full_name"]
+    rollup["staff_names"] = staff_names
+    rollup["reconciled_at"] = now.isoformat()
+    
+    await db.analytics_rollups.replace_one({"_id": ROLLUP_ID}, rollup, upsert=True)
+    return rollup
+
+@scheduled_job("analytics_reconcile", ANALYTICS_RECONCILE_SECONDS)
+async def reconcile_analytics_rollups() -> dict:
+    """Rebuild the rollup to pick up date-driven overdue changes and repair drift"""
+    rollup = await rebuild_analytics_rollups()
+    return {
+        "transcript_requests": rollup["transcript_requests"]["total"],
+        "recommendation_requests": rollup["recommendation_requests"]["total"]
+    }
+
+# ==================== ANALYTICS ====================
+
+PERIOD_LABEL_FORMATS = {"day": "%Y-%m-%d", "week": "%Y-%m-%d", "month": "%b %Y"}
+
+def period_starts(now: datetime, months: int, granularity: str) -> List[datetime]:
+    """Start of every period in a window covering the last `months` calendar months"""
+    year, month = divmod(now.year * 12 + now.month - 1 - (months - 1), 12)
+    start = datetime(year, month + 1, 1)
+    if granularity == "month":
+        starts = []
+        for i in range(months):
+            year, month = divmod(start.year * 12 + start.month - 1 + i, 12)
+            starts.append(datetime(year, month + 1, 1))
+        return starts
+    
+    if granularity == "week":
+        # Weeks start on Monday, matching $dateTrunc's startOfWeek below
+        start -= timedelta(days=start.weekday())
+        step = timedelta(days=7)
     else:
-        total = pending = in_progress = processing = ready = completed = rejected = 0
-        requests_by_enrollment = [
-            {"name": "Enrolled", "value": 0},
-            {"name": "Graduate", "value": 0},
-            {"name": "Withdrawn", "value": 0}
-        ]
-        requests_by_collection_method = [
-            {"name": "Pickup at Bursary", "value": 0},
-            {"name": "Emailed to Institution", "value": 0},
-            {"name": "Physical Delivery", "value": 0}
+        step = timedelta(days=1)
+    
+    starts = []
+    end = now.replace(tzinfo=None)
+    while start <= end:
+        starts.append(start)
+        start += step
+    return starts
+
+async def count_requests_by_period(start: datetime, granularity: str) -> dict:
+    """Count transcript and recommendation requests per period in a single aggregation.
+    
+    Returns {(period_start, kind): count} with naive UTC period starts.
+    """
+    def branch(kind: str) -> list:
+        return [
+            {"$match": {"created_at": {"$gte": start.isoformat()}}},
+            {"$project": {
+                "_id": 0,
+                "kind": {"$literal": kind},
+                "created": {"$dateFromString": {"dateString": "$created_at", "onError": None, "onNull": None}}
+            }}
         ]
-        staff_workload = []
     
-    # Requests by month (last 6 months) - using aggregation
-    requests_by_month = []
+    pipeline = branch("transcripts") + [
+        {"$unionWith": {"coll": "recommendation_requests", "pipeline": branch("recommendations")}},
+        {"$match": {"created": {"$ne": None}}},
+        {"$group": {
+            "_id": {
+                "period": {"$dateTrunc": {"date": "$created", "unit": granularity, "startOfWeek": "monday"}},
+                "kind": "$kind"
+            },
+            "count": {"$sum": 1}
+        }}
+    ]
     
-    for i in range(5, -1, -1):
-        month_start = (now.replace(day=1) - timedelta(days=i*30)).replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1)
-        
-        # Count transcript requests for this month
-        transcript_count = await db.transcript_requests.count_documents({
-            "created_at": {
-                "$gte": month_start.isoformat(),
-                "$lt": month_end.isoformat()
-            }
-        })
-        
-        # Count recommendation requests for this month
-        recommendation_count = await db.recommendation_requests.count_documents({
-            "created_at": {
-                "$gte": month_start.isoformat(),
-                "$lt": month_end.isoformat()
-            }
-        })
-        
-        requests_by_month.append({
-            "month": month_start.strftime("%b %Y"),
+    counts = {}
+    async for item in db.transcript_requests.aggregate(pipeline):
+        counts[(item["_id"]["period"], item["_id"]["kind"])] = item["count"]
+    return counts
+
+async def build_requests_by_period(rollup: dict, now: datetime, months: int, granularity: str) -> List[dict]:
+    """Zero-filled request counts per period for the dashboard chart"""
+    starts = period_starts(now, months, granularity)
+    
+    if granularity == "month":
+        # Calendar-month counts are already maintained in the rollup
+        transcript_months = rollup["transcript_requests"]["created_month"]
+        recommendation_months = rollup["recommendation_requests"]["created_month"]
+        counts = {}
+        for start in starts:
+            month_key = start.strftime("%Y-%m")
+            counts[(start, "transcripts")] = transcript_months.get(month_key, 0)
+            counts[(start, "recommendations")] = recommendation_months.get(month_key, 0)
+    else:
+        counts = await count_requests_by_period(starts[0], granularity)
+    
+    label_format = PERIOD_LABEL_FORMATS[granularity]
+    series = []
+    for start in starts:
+        transcript_count = counts.get((start, "transcripts"), 0)
+        series.append({
+            "month": start.strftime(label_format),
+            "period_start": start.strftime("%Y-%m-%d"),
             "count": transcript_count,
             "transcripts": transcript_count,
-            "recommendations": recommendation_count
+            "recommendations": counts.get((start, "recommendations"), 0)
         })
+    return series
+
+@api_router.get("/analytics", response_model=AnalyticsResponse)
+async def get_analytics(
+    months: int = Query(6, ge=1, le=60),
+    granularity: str = Query("month", pattern="^(day|week|month)$"),
+    current_user: dict = Depends(get_current_user)
+):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view analytics")
     
-    # Get recommendation letter stats
-    total_rec = await db.recommendation_requests.count_documents({})
-    pending_rec = await db.recommendation_requests.count_documents({"status": "Pending"})
-    completed_rec = await db.recommendation_requests.count_documents({"status": "Completed"})
-    in_progress_rec = await db.recommendation_requests.count_documents({"status": "In Progress"})
-    rejected_rec = await db.recommendation_requests.count_documents({"status": "Rejected"})
+    now = datetime.now(timezone.utc)
     
-    # Recommendations by enrollment status (handle different case variations)
-    recommendations_by_enrollment = []
+    rollup = await db.analytics_rollups.find_one({"_id": ROLLUP_ID})
+    if not rollup:
+        rollup = await rebuild_analytics_rollups()
     
-    # Get all enrollment statuses from recommendation requests
-    rec_enrollment_counts = await db.recommendation_requests.aggregate([
-        {"$group": {"_id": "$enrollment_status", "count": {"$sum": 1}}}
-    ]).to_list(10)
+    transcripts = rollup["transcript_requests"]
+    recommendations = rollup["recommendation_requests"]
+    overdue = rollup["overdue"]
+    
+    # Transcript status counts
+    status_map = transcripts["status"]
+    
+    # Transcript enrollment and collection method counts
+    enrollment_map = transcripts["enrollment_status"]
+    requests_by_enrollment = [
+        {"name": "Enrolled", "value": enrollment_map.get("enrolled", 0)},
+        {"name": "Graduate", "value": enrollment_map.get("graduate", 0)},
+        {"name": "Withdrawn", "value": enrollment_map.get("withdrawn", 0)}
+    ]
+    collection_map = transcripts["collection_method"]
+    requests_by_collection_method = [
+        {"name": "Pickup at Bursary", "value": collection_map.get("pickup", 0)},
+        {"name": "Emailed to Institution", "value": collection_map.get("emailed", 0)},
+        {"name": "Physical Delivery", "value": collection_map.get("delivery", 0)}
+    ]
+    
+    # Staff workload - include both transcripts and recommendations
+    staff_workload_map = dict(transcripts["assigned_staff_id"])
+    for staff_id, count in recommendations["assigned_staff_id"].items():
+        staff_workload_map[staff_id] = staff_workload_map.get(staff_id, 0) + count
+    
+    staff_names = rollup.get("staff_names", {})
+    staff_workload = [
+        {"name": staff_names.get(staff_id, "Unknown"), "requests": count}
+        for staff_id, count in staff_workload_map.items() if count > 0
+    ]
+    total_unassigned = transcripts["unassigned"] + recommendations["unassigned"]
+    if total_unassigned > 0:
+        staff_workload.append({"name": "Unassigned", "requests": total_unassigned})
     
-    # Normalize and aggregate enrollment counts
+    # Requests per period (default: last 6 calendar months)
+    requests_by_month = await build_requests_by_period(rollup, now, months, granularity)
+    
+    # Recommendations by enrollment status (handle different case variations)
     enrolled_count = 0
     graduate_count = 0
     withdrawn_count = 0
-    
-    for item in rec_enrollment_counts:
-        status = (item["_id"] or "").lower()
-        count = item["count"]
+    for key, count in recommendations["enrollment_status"].items():
+        status = key.lower()
         if status in ["enrolled", "currently enrolled"]:
             enrolled_count += count
         elif status in ["graduate", "graduate/alumni", "alumni"]:
@@ -1816,204 +3679,439 @@ async def get_analytics(current_user: dict = Depends(get_current_user)):
         {"name": "Withdrawn", "value": withdrawn_count}
     ]
     
-    # Get overdue recommendation requests
-    overdue_rec_count = 0
-    overdue_rec_by_days = []
-    rec_requests = await db.recommendation_requests.find({
-        "status": {"$nin": ["Completed", "Rejected"]},
-        "needed_by_date": {"$ne": None, "$ne": ""}
-    }, {"_id": 0, "needed_by_date": 1}).to_list(10000)
-    
-    for req in rec_requests:
-        try:
-            needed_date = datetime.fromisoformat(req["needed_by_date"].replace('Z', '+00:00')).date()
-            if needed_date < now.date():
-                overdue_rec_count += 1
-                days_overdue = (now.date() - needed_date).days
-                if days_overdue <= 7:
-                    overdue_rec_by_days.append({"days": "1-7 days", "count": 1})
-                elif days_overdue <= 14:
-                    overdue_rec_by_days.append({"days": "8-14 days", "count": 1})
-                elif days_overdue <= 30:
-                    overdue_rec_by_days.append({"days": "15-30 days", "count": 1})
-                else:
-                    overdue_rec_by_days.append({"days": "30+ days", "count": 1})
-        except:
-            pass
-    
-    # Aggregate overdue recommendation by days
-    rec_overdue_agg = {}
-    for item in overdue_rec_by_days:
-        rec_overdue_agg[item["days"]] = rec_overdue_agg.get(item["days"], 0) + 1
-    overdue_rec_by_days_list = [{"days": k, "count": v} for k, v in rec_overdue_agg.items()]
-    
-    # Get recommendation collection method breakdown
-    rec_collection_counts = await db.recommendation_requests.aggregate([
-        {"$group": {"_id": "$collection_method", "count": {"$sum": 1}}}
-    ]).to_list(10)
-    rec_collection_map = {item["_id"]: item["count"] for item in rec_collection_counts if item["_id"]}
+    rec_collection_map = recommendations["collection_method"]
     recommendations_by_collection_method = [
         {"name": "Pickup at School", "value": rec_collection_map.get("pickup", 0)},
         {"name": "Emailed to Institution", "value": rec_collection_map.get("emailed", 0)},
         {"name": "Physical Delivery", "value": rec_collection_map.get("delivery", 0)}
     ]
     
-    return AnalyticsResponse(
-        total_requests=total,
-        pending_requests=pending,
-        in_progress_requests=in_progress,
-        processing_requests=processing,
-        ready_requests=ready,
-        completed_requests=completed,
-        rejected_requests=rejected,
-        overdue_requests=overdue_count,
-        requests_by_month=requests_by_month,
-        requests_by_enrollment=requests_by_enrollment,
-        recommendations_by_enrollment=recommendations_by_enrollment,
-        requests_by_collection_method=requests_by_collection_method,
-        staff_workload=staff_workload,
-        overdue_by_days=overdue_by_days_list,
-        total_recommendation_requests=total_rec,
-        pending_recommendation_requests=pending_rec,
-        in_progress_recommendation_requests=in_progress_rec,
-        completed_recommendation_requests=completed_rec,
-        rejected_recommendation_requests=rejected_rec,
-        overdue_recommendation_requests=overdue_rec_count,
-        recommendations_by_collection_method=recommendations_by_collection_method,
-        overdue_transcripts_by_days=overdue_by_days_list,
-        overdue_recommendations_by_days=overdue_rec_by_days_list
-    )
+    # Overdue breakdowns (refreshed by the reconciler)
+    transcript_overdue_days = overdue["transcript_requests"]["by_days"]
+    overdue_by_days_list = [
+        {"name": label, "value": transcript_overdue_days[label], "color": "#ef4444" if "15+" in label else "#f97316" if "8-14" in label else "#eab308" if "4-7" in label else "#fbbf24"}
+        for _, label in TRANSCRIPT_OVERDUE_BUCKETS if transcript_overdue_days.get(label, 0) > 0
+    ]
+    rec_overdue_days = overdue["recommendation_requests"]["by_days"]
+    overdue_rec_by_days_list = [
+        {"days": label, "count": rec_overdue_days[label]}
+        for _, label in RECOMMENDATION_OVERDUE_BUCKETS if rec_overdue_days.get(label, 0) > 0
+    ]
+    
+    rec_status_map = recommendations["status"]
+    return AnalyticsResponse(
+        total_requests=transcripts["total"],
+        pending_requests=status_map.get("Pending", 0),
+        in_progress_requests=status_map.get("In Progress", 0),
+        processing_requests=status_map.get("Processing", 0),
+        ready_requests=status_map.get("Ready", 0),
+        completed_requests=status_map.get("Completed", 0),
+        rejected_requests=status_map.get("Rejected", 0),
+        overdue_requests=overdue["transcript_requests"]["count"],
+        requests_by_month=requests_by_month,
+        requests_by_enrollment=requests_by_enrollment,
+        recommendations_by_enrollment=recommendations_by_enrollment,
+        requests_by_collection_method=requests_by_collection_method,
+        staff_workload=staff_workload,
+        overdue_by_days=overdue_by_days_list,
+        total_recommendation_requests=recommendations["total"],
+        pending_recommendation_requests=rec_status_map.get("Pending", 0),
+        in_progress_recommendation_requests=rec_status_map.get("In Progress", 0),
+        completed_recommendation_requests=rec_status_map.get("Completed", 0),
+        rejected_recommendation_requests=rec_status_map.get("Rejected", 0),
+        overdue_recommendation_requests=overdue["recommendation_requests"]["count"],
+        recommendations_by_collection_method=recommendations_by_collection_method,
+        overdue_transcripts_by_days=overdue_by_days_list,
+        overdue_recommendations_by_days=overdue_rec_by_days_list
+    )
+
+# ==================== HEALTH CHECK ====================
+
+@api_router.get("/")
+async def root():
+    return {"message": "WBS Transcript and Recommendation Tracker API", "status": "running"}
+
+@api_router.get("/health")
+async def health_check():
+    return {"status": "healthy"}
+
+# ==================== EXPORT/REPORTING ENDPOINTS ====================
+
+def format_date_for_export(date_str):
+    """Format date string for export"""
+    try:
+        if date_str:
+            dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+            return dt.strftime("%Y-%m-%d %H:%M")
+    except:
+        pass
+    return date_str or ""
+
+def format_years_for_export(years_data):
+    """Format years attended/academic years for export"""
+    if isinstance(years_data, list):
+        return ", ".join([f"{y.get('from_year', '')}-{y.get('to_year', '')}" for y in years_data])
+    return str(years_data) if years_data else ""
+
+# Exports never need the embedded history arrays
+EXPORT_PROJECTION = {"_id": 0, "timeline": 0, "documents": 0}
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+def start_xlsx_sheet(ws, headers: List[str], sample_rows: List[list], header_color: str):
+    """Size the columns from a sample of rows, then write the header and the sample.
+    
+    Write-only worksheets need column widths before the first row is written,
+    so widths come from the buffered prefix instead of a pass over every cell.
+    """
+    for col, header in enumerate(headers, 1):
+        max_length = max([len(str(header))] + [len(str(row[col - 1] or "")) for row in sample_rows])
+        ws.column_dimensions[get_column_letter(col)].width = min(max_length + 2, 40)
+    
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color=header_color, end_color=header_color, fill_type="solid")
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = Alignment(horizontal="center")
+        header_cells.append(cell)
+    ws.append(header_cells)
+    
+    for row in sample_rows:
+        ws.append(row)
+
+async def iter_spooled_file(file_path: Path):
+    """Stream a spooled export and delete it once sent or abandoned"""
+    try:
+        stat_result = await aiofiles.os.stat(file_path)
+        async for chunk in iter_file(file_path, 0, stat_result.st_size):
+            yield chunk
+    finally:
+        await aiofiles.os.remove(file_path)
+
+async def spooled_file_response(file_path: Path, media_type: str, filename: str) -> StreamingResponse:
+    stat_result = await aiofiles.os.stat(file_path)
+    return StreamingResponse(
+        iter_spooled_file(file_path),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(stat_result.st_size)
+        }
+    )
+
+# reportlab, python-docx and openpyxl are CPU-bound pure Python, so reports are
+# rendered in a process pool instead of on the event loop. Workers are spawned
+# rather than forked because this process already runs threads (bcrypt, Motor).
+# Once REPORT_MAX_PENDING renders are queued or running, new ones get a 503.
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', str(min(2, os.cpu_count() or 1))))
+REPORT_MAX_PENDING = int(os.environ.get('REPORT_MAX_PENDING', '8'))
+REPORT_TIMEOUT_SECONDS = int(os.environ.get('REPORT_TIMEOUT_SECONDS', '300'))
+report_executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+report_stats = {"pending": 0, "completed": 0, "rejected": 0, "timeouts": 0, "failed": 0, "total_ms": 0.0, "max_ms": 0.0}
+
+async def run_report(func, *args, on_abandon=None):
+    """Run func in the report pool and return its result.
+    
+    A render that times out (or whose caller goes away) cannot be interrupted,
+    so its pending slot is only released once the worker process is actually
+    done with it; on_abandon is then called to discard whatever it wrote.
+    """
+    if report_stats["pending"] >= REPORT_MAX_PENDING:
+        report_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Report generation is busy, please try again shortly",
+            headers={"Retry-After": "5"}
+        )
+    
+    loop = asyncio.get_running_loop()
+    abandoned = False
+    
+    def release():
+        report_stats["pending"] -= 1
+        if abandoned and on_abandon:
+            on_abandon()
+    
+    started = time.monotonic()
+    future = report_executor.submit(func, *args)
+    report_stats["pending"] += 1
+    # Runs on the pool's management thread once the job is finished or cancelled
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(release))
+    
+    try:
+        # Cancelling the wrapper also cancels the job if it has not started yet
+        result = await asyncio.wait_for(asyncio.wrap_future(future), REPORT_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        abandoned = True
+        report_stats["timeouts"] += 1
+        raise HTTPException(status_code=504, detail="Report generation timed out")
+    except asyncio.CancelledError:
+        abandoned = True
+        raise
+    except Exception:
+        report_stats["failed"] += 1
+        raise
+    
+    elapsed_ms = (time.monotonic() - started) * 1000
+    report_stats["completed"] += 1
+    report_stats["total_ms"] += elapsed_ms
+    report_stats["max_ms"] = max(report_stats["max_ms"], elapsed_ms)
+    return result
+
+async def spool_export_rows(cursor, build_row, progress=None) -> Path:
+    """Write formatted rows from a cursor to a temp file, one JSON list per line.
+    
+    This is the compact form reports are handed to the render pool in: only the
+    cell values, written batch by batch so the API process never holds them all.
+    progress, if given, is awaited with the running row count after each batch
+    and whether spooling has finished.
+    """
+    rows_path = EXPORT_TMP_DIR / f"{uuid.uuid4()}.rows"
+    try:
+        async with aiofiles.open(rows_path, "w") as f:
+            batch = []
+            rows_written = 0
+            async for req in cursor:
+                batch.append(json.dumps(build_row(req)))
+                if len(batch) >= EXPORT_BATCH_SIZE:
+                    await f.write("\n".join(batch) + "\n")
+                    rows_written += len(batch)
+                    batch = []
+                    if progress:
+                        await progress(rows_written, False)
+            if batch:
+                await f.write("\n".join(batch) + "\n")
+                rows_written += len(batch)
+        if progress:
+            await progress(rows_written, True)
+    except BaseException:
+        rows_path.unlink(missing_ok=True)
+        raise
+    return rows_path
+
+def read_spooled_rows(rows_path: str):
+    with open(rows_path) as f:
+        for line in f:
+            yield json.loads(line)
+
+async def render_export(cursor, build_row, render, suffix: str, *options, progress=None) -> Path:
+    """Spool rows from the cursor, render them in the report pool, return the output file"""
+    rows_path = await spool_export_rows(cursor, build_row, progress)
+    output_path = EXPORT_TMP_DIR / f"{uuid.uuid4()}.{suffix}"
+    try:
+        await run_report(render, str(rows_path), str(output_path), *options,
+                         on_abandon=lambda: output_path.unlink(missing_ok=True))
+    except BaseException:
+        output_path.unlink(missing_ok=True)
+        raise
+    finally:
+        rows_path.unlink(missing_ok=True)
+    return output_path
+
+def render_xlsx(rows_path: str, output_path: str, sheet_title: str, headers: List[str], header_color: str):
+    """Write spooled rows into a write-only worksheet in constant memory.
+    
+    Only the first XLSX_WIDTH_SAMPLE_ROWS rows are buffered to size the columns.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_title)
+    
+    sample_rows = []
+    for row in read_spooled_rows(rows_path):
+        if sample_rows is None:
+            ws.append(row)
+            continue
+        sample_rows.append(row)
+        if len(sample_rows) >= XLSX_WIDTH_SAMPLE_ROWS:
+            start_xlsx_sheet(ws, headers, sample_rows, header_color)
+            sample_rows = None
+    if sample_rows is not None:
+        start_xlsx_sheet(ws, headers, sample_rows, header_color)
+    
+    wb.save(output_path)
 
-# ==================== HEALTH CHECK ====================
+TRANSCRIPT_EXPORT_FIELDS = ["id", "student_name", "student_email", "school_id", "status", "academic_years",
+                            "collection_method", "institution_name", "needed_by_date", "assigned_staff_name",
+                            "created_at", "updated_at"]
 
-@api_router.get("/")
-async def root():
-    return {"message": "WBS Transcript and Recommendation Tracker API", "status": "running"}
+def transcript_export_record(req: dict) -> dict:
+    return {
+        "id": req.get("id", ""),
+        "student_name": req.get("student_name", ""),
+        "student_email": req.get("student_email", ""),
+        "school_id": req.get("school_id", ""),
+        "status": req.get("status", ""),
+        "academic_years": format_years_for_export(req.get("academic_years", req.get("academic_year", ""))),
+        "collection_method": req.get("collection_method", ""),
+        "institution_name": req.get("institution_name", ""),
+        "needed_by_date": format_date_for_export(req.get("needed_by_date", "")),
+        "assigned_staff_name": req.get("assigned_staff_name") or "Unassigned",
+        "created_at": format_date_for_export(req.get("created_at", "")),
+        "updated_at": format_date_for_export(req.get("updated_at", "")),
+    }
 
-@api_router.get("/health")
-async def health_check():
-    return {"status": "healthy"}
+RECOMMENDATION_EXPORT_FIELDS = ["id", "student_name", "student_email", "status", "years_attended", "last_form_class",
+                                "institution_name", "program_name", "collection_method", "needed_by_date",
+                                "assigned_staff_name", "created_at", "updated_at"]
 
-# ==================== EXPORT/REPORTING ENDPOINTS ====================
+def recommendation_export_record(req: dict) -> dict:
+    return {
+        "id": req.get("id", ""),
+        "student_name": req.get("student_name", ""),
+        "student_email": req.get("student_email", ""),
+        "status": req.get("status", ""),
+        "years_attended": format_years_for_export(req.get("years_attended", req.get("years_attended_str", ""))),
+        "last_form_class": req.get("last_form_class", ""),
+        "institution_name": req.get("institution_name", ""),
+        "program_name": req.get("program_name", ""),
+        "collection_method": req.get("collection_method", ""),
+        "needed_by_date": format_date_for_export(req.get("needed_by_date", "")),
+        "assigned_staff_name": req.get("assigned_staff_name") or "Unassigned",
+        "created_at": format_date_for_export(req.get("created_at", "")),
+        "updated_at": format_date_for_export(req.get("updated_at", "")),
+    }
 
-def format_date_for_export(date_str):
-    """Format date string for export"""
-    try:
-        if date_str:
-            dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-            return dt.strftime("%Y-%m-%d %H:%M")
-    except:
-        pass
-    return date_str or ""
+async def iter_csv_export(cursor, fields: List[str], build_record):
+    """Yield CSV text as the cursor produces rows, header first"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    yield buffer.getvalue()
+    
+    rows = 0
+    buffer.seek(0)
+    buffer.truncate()
+    async for req in cursor:
+        writer.writerow(build_record(req))
+        rows += 1
+        if rows % STREAM_EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
 
-def format_years_for_export(years_data):
-    """Format years attended/academic years for export"""
-    if isinstance(years_data, list):
-        return ", ".join([f"{y.get('from_year', '')}-{y.get('to_year', '')}" for y in years_data])
-    return str(years_data) if years_data else ""
+async def iter_ndjson_export(cursor, build_record):
+    """Yield one JSON object per line as the cursor produces rows"""
+    lines = []
+    async for req in cursor:
+        lines.append(json.dumps(build_record(req)) + "\n")
+        if len(lines) >= STREAM_EXPORT_BATCH_SIZE:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
 
-@api_router.get("/export/transcripts/{format_type}")
-async def export_transcript_requests(format_type: str, status: Optional[str] = None, current_user: dict = Depends(get_current_user)):
-    """Export transcript requests as DOCX, PDF, or XLSX"""
-    if current_user["role"] not in ["admin", "staff"]:
-        raise HTTPException(status_code=403, detail="Insufficient permissions")
-    
-    # Build query
+def stream_rows_export(cursor, format_type: str, fields: List[str], build_record, filename_prefix: str) -> StreamingResponse:
+    """Stream a CSV or NDJSON export straight from the cursor in small batches"""
+    cursor = cursor.batch_size(STREAM_EXPORT_BATCH_SIZE)
+    if format_type == "csv":
+        body = iter_csv_export(cursor, fields, build_record)
+        media_type = "text/csv; charset=utf-8"
+    else:
+        body = iter_ndjson_export(cursor, build_record)
+        media_type = "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename_prefix}_{datetime.now().strftime('%Y%m%d')}.{format_type}"}
+    )
+
+def build_export_query(current_user: dict, status: Optional[str]) -> dict:
+    """Staff export only their assigned requests; status "all" means no filter"""
     query = {}
     if current_user["role"] == "staff":
         query["assigned_staff_id"] = current_user["id"]
     if status and status != "all":
         query["status"] = status
+    return query
+
+@api_router.get("/export/transcripts/{format_type}")
+async def export_transcript_requests(format_type: str, status: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Export transcript requests as DOCX, PDF, XLSX, CSV, or NDJSON"""
+    if current_user["role"] not in ["admin", "staff"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    requests = await db.transcript_requests.find(query, {"_id": 0}).sort("created_at", -1).to_list(10000)
+    query = build_export_query(current_user, status)
+    cursor = db.transcript_requests.find(query, EXPORT_PROJECTION).sort("created_at", -1).batch_size(EXPORT_BATCH_SIZE)
     
-    if format_type == "xlsx":
-        return generate_transcript_xlsx(requests)
+    if format_type in ["csv", "ndjson"]:
+        return stream_rows_export(cursor, format_type, TRANSCRIPT_EXPORT_FIELDS, transcript_export_record, "transcript_requests")
+    elif format_type == "xlsx":
+        return await generate_transcript_xlsx(cursor)
     elif format_type == "pdf":
-        return generate_transcript_pdf(requests)
+        return await generate_transcript_pdf(cursor.limit(10000))
     elif format_type == "docx":
-        return generate_transcript_docx(requests)
+        return await generate_transcript_docx(cursor.limit(10000))
     else:
-        raise HTTPException(status_code=400, detail="Invalid format. Use xlsx, pdf, or docx")
+        raise HTTPException(status_code=400, detail="Invalid format. Use xlsx, pdf, docx, csv, or ndjson")
 
 @api_router.get("/export/recommendations/{format_type}")
 async def export_recommendation_requests(format_type: str, status: Optional[str] = None, current_user: dict = Depends(get_current_user)):
-    """Export recommendation requests as DOCX, PDF, or XLSX"""
+    """Export recommendation requests as DOCX, PDF, XLSX, CSV, or NDJSON"""
     if current_user["role"] not in ["admin", "staff"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    # Build query
-    query = {}
-    if current_user["role"] == "staff":
-        query["assigned_staff_id"] = current_user["id"]
-    if status and status != "all":
-        query["status"] = status
-    
-    requests = await db.recommendation_requests.find(query, {"_id": 0}).sort("created_at", -1).to_list(10000)
+    query = build_export_query(current_user, status)
+    cursor = db.recommendation_requests.find(query, EXPORT_PROJECTION).sort("created_at", -1).batch_size(EXPORT_BATCH_SIZE)
     
-    if format_type == "xlsx":
-        return generate_recommendation_xlsx(requests)
+    if format_type in ["csv", "ndjson"]:
+        return stream_rows_export(cursor, format_type, RECOMMENDATION_EXPORT_FIELDS, recommendation_export_record, "recommendation_requests")
+    elif format_type == "xlsx":
+        return await generate_recommendation_xlsx(cursor)
     elif format_type == "pdf":
-        return generate_recommendation_pdf(requests)
+        return await generate_recommendation_pdf(cursor.limit(10000))
     elif format_type == "docx":
-        return generate_recommendation_docx(requests)
+        return await generate_recommendation_docx(cursor.limit(10000))
     else:
-        raise HTTPException(status_code=400, detail="Invalid format. Use xlsx, pdf, or docx")
+        raise HTTPException(status_code=400, detail="Invalid format. Use xlsx, pdf, docx, csv, or ndjson")
 
-def generate_transcript_xlsx(requests):
+TRANSCRIPT_XLSX_HEADERS = ["ID", "Student Name", "Email", "School ID", "Status", "Academic Years",
+                           "Collection Method", "Institution", "Needed By", "Assigned Staff", "Created At"]
+
+def transcript_xlsx_row(req: dict) -> list:
+    return [
+        req.get("id", "")[:8],
+        req.get("student_name", ""),
+        req.get("student_email", ""),
+        req.get("school_id", ""),
+        req.get("status", ""),
+        format_years_for_export(req.get("academic_years", req.get("academic_year", ""))),
+        req.get("collection_method", ""),
+        req.get("institution_name", ""),
+        format_date_for_export(req.get("needed_by_date", "")),
+        req.get("assigned_staff_name", "Unassigned"),
+        format_date_for_export(req.get("created_at", "")),
+    ]
+
+async def generate_transcript_xlsx(cursor):
     """Generate XLSX file for transcript requests"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Transcript Requests"
-    
-    # Headers
-    headers = ["ID", "Student Name", "Email", "School ID", "Status", "Academic Years", 
-               "Collection Method", "Institution", "Needed By", "Assigned Staff", "Created At"]
-    
-    # Style headers
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="800000", end_color="800000", fill_type="solid")
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal="center")
-    
-    # Data rows
-    for row_num, req in enumerate(requests, 2):
-        ws.cell(row=row_num, column=1, value=req.get("id", "")[:8])
-        ws.cell(row=row_num, column=2, value=req.get("student_name", ""))
-        ws.cell(row=row_num, column=3, value=req.get("student_email", ""))
-        ws.cell(row=row_num, column=4, value=req.get("school_id", ""))
-        ws.cell(row=row_num, column=5, value=req.get("status", ""))
-        ws.cell(row=row_num, column=6, value=format_years_for_export(req.get("academic_years", req.get("academic_year", ""))))
-        ws.cell(row=row_num, column=7, value=req.get("collection_method", ""))
-        ws.cell(row=row_num, column=8, value=req.get("institution_name", ""))
-        ws.cell(row=row_num, column=9, value=format_date_for_export(req.get("needed_by_date", "")))
-        ws.cell(row=row_num, column=10, value=req.get("assigned_staff_name", "Unassigned"))
-        ws.cell(row=row_num, column=11, value=format_date_for_export(req.get("created_at", "")))
-    
-    # Adjust column widths
-    for col in ws.columns:
-        max_length = max(len(str(cell.value or "")) for cell in col)
-        ws.column_dimensions[col[0].column_letter].width = min(max_length + 2, 40)
-    
-    # Save to buffer
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    
-    return StreamingResponse(
-        buffer,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=transcript_requests_{datetime.now().strftime('%Y%m%d')}.xlsx"}
-    )
+    output_path = await render_export(cursor, transcript_xlsx_row, render_xlsx, "xlsx", "Transcript Requests", TRANSCRIPT_XLSX_HEADERS, "800000")
+    return await spooled_file_response(output_path, XLSX_MEDIA_TYPE, f"transcript_requests_{datetime.now().strftime('%Y%m%d')}.xlsx")
+
+def transcript_pdf_row(req: dict) -> list:
+    return [
+        req.get("id", "")[:8],
+        req.get("student_name", ""),
+        req.get("status", ""),
+        format_years_for_export(req.get("academic_years", req.get("academic_year", "")))[:20],
+        req.get("collection_method", ""),
+        (req.get("institution_name", "") or "")[:20],
+        format_date_for_export(req.get("needed_by_date", ""))[:10],
+        (req.get("assigned_staff_name", "") or "Unassigned")[:15]
+    ]
 
-def generate_transcript_pdf(requests):
+async def generate_transcript_pdf(cursor):
     """Generate PDF file for transcript requests"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(letter), topMargin=30, bottomMargin=30)
+    output_path = await render_export(cursor, transcript_pdf_row, render_transcript_pdf, "pdf")
+    return await spooled_file_response(output_path, "application/pdf", f"transcript_requests_{datetime.now().strftime('%Y%m%d')}.pdf")
+
+def render_transcript_pdf(rows_path: str, output_path: str):
+    doc = SimpleDocTemplate(output_path, pagesize=landscape(letter), topMargin=30, bottomMargin=30)
     
     elements = []
     styles = getSampleStyleSheet()
@@ -2026,18 +4124,7 @@ def generate_transcript_pdf(requests):
     
     # Table data
     data = [["ID", "Student", "Status", "Academic Years", "Collection", "Institution", "Needed By", "Staff"]]
-    
-    for req in requests:
-        data.append([
-            req.get("id", "")[:8],
-            req.get("student_name", ""),
-            req.get("status", ""),
-            format_years_for_export(req.get("academic_years", req.get("academic_year", "")))[:20],
-            req.get("collection_method", ""),
-            (req.get("institution_name", "") or "")[:20],
-            format_date_for_export(req.get("needed_by_date", ""))[:10],
-            (req.get("assigned_staff_name", "") or "Unassigned")[:15]
-        ])
+    data.extend(read_spooled_rows(rows_path))
     
     # Create table
     table = Table(data, repeatRows=1)
@@ -2058,16 +4145,25 @@ def generate_transcript_pdf(requests):
     
     elements.append(table)
     doc.build(elements)
-    buffer.seek(0)
-    
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=transcript_requests_{datetime.now().strftime('%Y%m%d')}.pdf"}
-    )
 
-def generate_transcript_docx(requests):
+def transcript_docx_row(req: dict) -> list:
+    return [
+        req.get("student_name", ""),
+        req.get("status", ""),
+        format_years_for_export(req.get("academic_years", req.get("academic_year", ""))),
+        req.get("collection_method", ""),
+        req.get("institution_name", "") or "",
+        format_date_for_export(req.get("needed_by_date", ""))[:10],
+        req.get("assigned_staff_name", "") or "Unassigned"
+    ]
+
+async def generate_transcript_docx(cursor):
     """Generate DOCX file for transcript requests"""
+    output_path = await render_export(cursor, transcript_docx_row, render_transcript_docx, "docx")
+    return await spooled_file_response(output_path, DOCX_MEDIA_TYPE, f"transcript_requests_{datetime.now().strftime('%Y%m%d')}.docx")
+
+def render_transcript_docx(rows_path: str, output_path: str):
+    rows = list(read_spooled_rows(rows_path))
     doc = Document()
     
     # Title
@@ -2075,7 +4171,7 @@ def generate_transcript_docx(requests):
     title.alignment = WD_ALIGN_PARAGRAPH.CENTER
     
     doc.add_paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-    doc.add_paragraph(f"Total Requests: {len(requests)}")
+    doc.add_paragraph(f"Total Requests: {len(rows)}")
     doc.add_paragraph()
     
     # Create table
@@ -2090,82 +4186,57 @@ def generate_transcript_docx(requests):
         hdr_cells[i].paragraphs[0].runs[0].bold = True
     
     # Data rows
-    for req in requests:
+    for row in rows:
         row_cells = table.add_row().cells
-        row_cells[0].text = req.get("student_name", "")
-        row_cells[1].text = req.get("status", "")
-        row_cells[2].text = format_years_for_export(req.get("academic_years", req.get("academic_year", "")))
-        row_cells[3].text = req.get("collection_method", "")
-        row_cells[4].text = req.get("institution_name", "") or ""
-        row_cells[5].text = format_date_for_export(req.get("needed_by_date", ""))[:10]
-        row_cells[6].text = req.get("assigned_staff_name", "") or "Unassigned"
-    
-    # Save to buffer
-    buffer = io.BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
+        for i, value in enumerate(row):
+            row_cells[i].text = value or ""
     
-    return StreamingResponse(
-        buffer,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        headers={"Content-Disposition": f"attachment; filename=transcript_requests_{datetime.now().strftime('%Y%m%d')}.docx"}
-    )
+    doc.save(output_path)
 
-def generate_recommendation_xlsx(requests):
+RECOMMENDATION_XLSX_HEADERS = ["ID", "Student Name", "Email", "Status", "Years Attended", "Form Class",
+                               "Institution", "Program", "Collection Method", "Needed By", "Assigned Staff", "Created At"]
+
+def recommendation_xlsx_row(req: dict) -> list:
+    return [
+        req.get("id", "")[:8],
+        req.get("student_name", ""),
+        req.get("student_email", ""),
+        req.get("status", ""),
+        format_years_for_export(req.get("years_attended", req.get("years_attended_str", ""))),
+        req.get("last_form_class", ""),
+        req.get("institution_name", ""),
+        req.get("program_name", ""),
+        req.get("collection_method", ""),
+        format_date_for_export(req.get("needed_by_date", "")),
+        req.get("assigned_staff_name", "Unassigned"),
+        format_date_for_export(req.get("created_at", "")),
+    ]
+
+async def generate_recommendation_xlsx(cursor):
     """Generate XLSX file for recommendation requests"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Recommendation Requests"
-    
-    # Headers
-    headers = ["ID", "Student Name", "Email", "Status", "Years Attended", "Form Class",
-               "Institution", "Program", "Collection Method", "Needed By", "Assigned Staff", "Created At"]
-    
-    # Style headers
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="DAA520", end_color="DAA520", fill_type="solid")
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal="center")
-    
-    # Data rows
-    for row_num, req in enumerate(requests, 2):
-        ws.cell(row=row_num, column=1, value=req.get("id", "")[:8])
-        ws.cell(row=row_num, column=2, value=req.get("student_name", ""))
-        ws.cell(row=row_num, column=3, value=req.get("student_email", ""))
-        ws.cell(row=row_num, column=4, value=req.get("status", ""))
-        ws.cell(row=row_num, column=5, value=format_years_for_export(req.get("years_attended", req.get("years_attended_str", ""))))
-        ws.cell(row=row_num, column=6, value=req.get("last_form_class", ""))
-        ws.cell(row=row_num, column=7, value=req.get("institution_name", ""))
-        ws.cell(row=row_num, column=8, value=req.get("program_name", ""))
-        ws.cell(row=row_num, column=9, value=req.get("collection_method", ""))
-        ws.cell(row=row_num, column=10, value=format_date_for_export(req.get("needed_by_date", "")))
-        ws.cell(row=row_num, column=11, value=req.get("assigned_staff_name", "Unassigned"))
-        ws.cell(row=row_num, column=12, value=format_date_for_export(req.get("created_at", "")))
-    
-    # Adjust column widths
-    for col in ws.columns:
-        max_length = max(len(str(cell.value or "")) for cell in col)
-        ws.column_dimensions[col[0].column_letter].width = min(max_length + 2, 40)
-    
-    # Save to buffer
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    
-    return StreamingResponse(
-        buffer,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=recommendation_requests_{datetime.now().strftime('%Y%m%d')}.xlsx"}
-    )
+    output_path = await render_export(cursor, recommendation_xlsx_row, render_xlsx, "xlsx", "Recommendation Requests", RECOMMENDATION_XLSX_HEADERS, "DAA520")
+    return await spooled_file_response(output_path, XLSX_MEDIA_TYPE, f"recommendation_requests_{datetime.now().strftime('%Y%m%d')}.xlsx")
+
+def recommendation_pdf_row(req: dict) -> list:
+    return [
+        req.get("id", "")[:8],
+        req.get("student_name", ""),
+        req.get("status", ""),
+        format_years_for_export(req.get("years_attended", req.get("years_attended_str", "")))[:15],
+        (req.get("institution_name", "") or "")[:18],
+        (req.get("program_name", "") or "")[:18],
+        req.get("collection_method", ""),
+        format_date_for_export(req.get("needed_by_date", ""))[:10],
+        (req.get("assigned_staff_name", "") or "Unassigned")[:12]
+    ]
 
-def generate_recommendation_pdf(requests):
+async def generate_recommendation_pdf(cursor):
     """Generate PDF file for recommendation requests"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(letter), topMargin=30, bottomMargin=30)
+    output_path = await render_export(cursor, recommendation_pdf_row, render_recommendation_pdf, "pdf")
+    return await spooled_file_response(output_path, "application/pdf", f"recommendation_requests_{datetime.now().strftime('%Y%m%d')}.pdf")
+
+def render_recommendation_pdf(rows_path: str, output_path: str):
+    doc = SimpleDocTemplate(output_path, pagesize=landscape(letter), topMargin=30, bottomMargin=30)
     
     elements = []
     styles = getSampleStyleSheet()
@@ -2178,19 +4249,7 @@ def generate_recommendation_pdf(requests):
     
     # Table data
     data = [["ID", "Student", "Status", "Years", "Institution", "Program", "Collection", "Needed By", "Staff"]]
-    
-    for req in requests:
-        data.append([
-            req.get("id", "")[:8],
-            req.get("student_name", ""),
-            req.get("status", ""),
-            format_years_for_export(req.get("years_attended", req.get("years_attended_str", "")))[:15],
-            (req.get("institution_name", "") or "")[:18],
-            (req.get("program_name", "") or "")[:18],
-            req.get("collection_method", ""),
-            format_date_for_export(req.get("needed_by_date", ""))[:10],
-            (req.get("assigned_staff_name", "") or "Unassigned")[:12]
-        ])
+    data.extend(read_spooled_rows(rows_path))
     
     # Create table
     table = Table(data, repeatRows=1)
@@ -2211,16 +4270,26 @@ def generate_recommendation_pdf(requests):
     
     elements.append(table)
     doc.build(elements)
-    buffer.seek(0)
-    
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=recommendation_requests_{datetime.now().strftime('%Y%m%d')}.pdf"}
-    )
 
-def generate_recommendation_docx(requests):
+def recommendation_docx_row(req: dict) -> list:
+    return [
+        req.get("student_name", ""),
+        req.get("status", ""),
+        format_years_for_export(req.get("years_attended", req.get("years_attended_str", ""))),
+        req.get("last_form_class", ""),
+        req.get("institution_name", "") or "",
+        req.get("program_name", "") or "",
+        format_date_for_export(req.get("needed_by_date", ""))[:10],
+        req.get("assigned_staff_name", "") or "Unassigned"
+    ]
+
+async def generate_recommendation_docx(cursor):
     """Generate DOCX file for recommendation requests"""
+    output_path = await render_export(cursor, recommendation_docx_row, render_recommendation_docx, "docx")
+    return await spooled_file_response(output_path, DOCX_MEDIA_TYPE, f"recommendation_requests_{datetime.now().strftime('%Y%m%d')}.docx")
+
+def render_recommendation_docx(rows_path: str, output_path: str):
+    rows = list(read_spooled_rows(rows_path))
     doc = Document()
     
     # Title
@@ -2228,7 +4297,7 @@ def generate_recommendation_docx(requests):
     title.alignment = WD_ALIGN_PARAGRAPH.CENTER
     
     doc.add_paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-    doc.add_paragraph(f"Total Requests: {len(requests)}")
+    doc.add_paragraph(f"Total Requests: {len(rows)}")
     doc.add_paragraph()
     
     # Create table
@@ -2243,26 +4312,362 @@ def generate_recommendation_docx(requests):
         hdr_cells[i].paragraphs[0].runs[0].bold = True
     
     # Data rows
-    for req in requests:
+    for row in rows:
         row_cells = table.add_row().cells
-        row_cells[0].text = req.get("student_name", "")
-        row_cells[1].text = req.get("status", "")
-        row_cells[2].text = format_years_for_export(req.get("years_attended", req.get("years_attended_str", "")))
-        row_cells[3].text = req.get("last_form_class", "")
-        row_cells[4].text = req.get("institution_name", "") or ""
-        row_cells[5].text = req.get("program_name", "") or ""
-        row_cells[6].text = format_date_for_export(req.get("needed_by_date", ""))[:10]
-        row_cells[7].text = req.get("assigned_staff_name", "") or "Unassigned"
-    
-    # Save to buffer
-    buffer = io.BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
+        for i, value in enumerate(row):
+            row_cells[i].text = value or ""
+    
+    doc.save(output_path)
+
+# ==================== EXPORT JOBS ====================
+
+# Large exports can run as background jobs: the client polls for status and
+# downloads the artifact when done. Artifacts are keyed by the export filter
+# plus a fingerprint of the matching data, so asking again for an unchanged
+# export reuses the file instead of rendering it again.
+EXPORT_JOB_WORKERS = int(os.environ.get('EXPORT_JOB_WORKERS', '1'))
+EXPORT_ARTIFACT_TTL_SECONDS = int(os.environ.get('EXPORT_ARTIFACT_TTL_SECONDS', '3600'))
+EXPORT_CLEANUP_SECONDS = int(os.environ.get('EXPORT_CLEANUP_SECONDS', '600'))
+EXPORT_JOB_POLL_SECONDS = 30
+EXPORT_JOB_CLAIM_SECONDS = REPORT_TIMEOUT_SECONDS + 300
+
+EXPORT_MEDIA_TYPES = {"xlsx": XLSX_MEDIA_TYPE, "pdf": "application/pdf", "docx": DOCX_MEDIA_TYPE}
+
+# kind -> collection, filename prefix and, per format, (row builder, renderer, render options, row limit)
+EXPORT_KINDS = {
+    "transcripts": {
+        "collection": "transcript_requests",
+        "filename": "transcript_requests",
+        "formats": {
+            "xlsx": (transcript_xlsx_row, render_xlsx, ("Transcript Requests", TRANSCRIPT_XLSX_HEADERS, "800000"), None),
+            "pdf": (transcript_pdf_row, render_transcript_pdf, (), 10000),
+            "docx": (transcript_docx_row, render_transcript_docx, (), 10000),
+        },
+    },
+    "recommendations": {
+        "collection": "recommendation_requests",
+        "filename": "recommendation_requests",
+        "formats": {
+            "xlsx": (recommendation_xlsx_row, render_xlsx, ("Recommendation Requests", RECOMMENDATION_XLSX_HEADERS, "DAA520"), None),
+            "pdf": (recommendation_pdf_row, render_recommendation_pdf, (), 10000),
+            "docx": (recommendation_docx_row, render_recommendation_docx, (), 10000),
+        },
+    },
+    "all_data": {
+        "collection": None,
+        "filename": "wbs_complete_data_export",
+        "formats": {"pdf": None},
+    },
+}
+
+class ExportJobCreate(BaseModel):
+    kind: str  # transcripts, recommendations, all_data
+    format: str  # xlsx, pdf, docx
+    status: Optional[str] = None
+
+class ExportJobResponse(BaseModel):
+    id: str
+    kind: str
+    format: str
+    status_filter: Optional[str] = None
+    state: str  # queued, running, done, failed
+    stage: Optional[str] = None  # spooling, rendering
+    rows_total: Optional[int] = None
+    rows_done: int = 0
+    reused: bool = False
+    error: Optional[str] = None
+    filename: str
+    created_at: str
+    finished_at: Optional[str] = None
+    expires_at: Optional[str] = None
+
+def export_job_response(job: dict) -> ExportJobResponse:
+    # Mongo hands back naive UTC datetimes
+    expires_at = job.get("expires_at")
+    return ExportJobResponse(**{**job, "expires_at": expires_at.replace(tzinfo=timezone.utc).isoformat() if expires_at else None})
+
+async def collection_fingerprint(collection, query: dict, field: str) -> list:
+    """Row count and newest timestamp of the matching documents"""
+    stats = await collection.aggregate([
+        {"$match": query},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "last": {"$max": f"${field}"}}}
+    ]).to_list(1)
+    if not stats:
+        return [0, None]
+    return [stats[0]["count"], stats[0]["last"]]
+
+async def export_cache_key(kind: str, format_type: str, query: dict) -> tuple:
+    """Hash of the export filter and a fingerprint of the data it covers.
+    
+    Any insert, delete or update of a matching request changes the count or the
+    newest updated_at, so an unchanged key means the artifact is still current.
+    Returns (cache_key, rows_total).
+    """
+    if kind == "all_data":
+        fingerprint = [
+            await collection_fingerprint(db.users, {"role": {"$ne": "admin"}}, "created_at"),
+            await collection_fingerprint(db.transcript_requests, {}, "updated_at"),
+            await collection_fingerprint(db.recommendation_requests, {}, "updated_at"),
+            await collection_fingerprint(db.notifications, {}, "created_at"),
+        ]
+        rows_total = sum(entry[0] for entry in fingerprint[:3])
+    else:
+        fingerprint = await collection_fingerprint(db[EXPORT_KINDS[kind]["collection"]], query, "updated_at")
+        rows_total = fingerprint[0]
+        limit = EXPORT_KINDS[kind]["formats"][format_type][3]
+        if limit:
+            rows_total = min(rows_total, limit)
+    raw = json.dumps([kind, format_type, query, fingerprint], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest(), rows_total
+
+def export_artifact_path(cache_key: str, format_type: str) -> Path:
+    return EXPORT_ARTIFACT_DIR / f"{cache_key}.{format_type}"
+
+async def find_cached_export(cache_key: str, format_type: str) -> Optional[dict]:
+    """A finished, unexpired job for the same key whose artifact is still on disk"""
+    job = await db.export_jobs.find_one(
+        {"cache_key": cache_key, "state": "done", "expires_at": {"$gt": datetime.now(timezone.utc)}},
+        {"_id": 0},
+        sort=[("expires_at", DESCENDING)]
+    )
+    if job and await aiofiles.os.path.exists(export_artifact_path(cache_key, format_type)):
+        return job
+    return None
+
+_export_job_wakeup = asyncio.Event()
+
+async def claim_export_job() -> Optional[dict]:
+    """Claim the oldest queued job, or a running one whose claimant died"""
+    now = datetime.now(timezone.utc)
+    return await db.export_jobs.find_one_and_update(
+        {"$or": [
+            {"state": "queued"},
+            {"state": "running", "claimed_until": {"$lte": now}}
+        ]},
+        {"$set": {
+            "state": "running",
+            "stage": "spooling",
+            "claimed_by": WORKER_ID,
+            # Several workers share a WORKER_ID, so each claim gets its own id
+            "claim_id": str(uuid.uuid4()),
+            "claimed_until": now + timedelta(seconds=EXPORT_JOB_CLAIM_SECONDS)
+        }},
+        sort=[("created_at", ASCENDING)],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+def export_job_claim(job: dict) -> dict:
+    """Filter matching the job only while this claim still owns it.
+    
+    A claim that expired and was taken over by another worker must not write
+    the job's state any more.
+    """
+    return {"id": job["id"], "claimed_by": WORKER_ID, "claim_id": job["claim_id"]}
+
+async def run_export_job(job: dict):
+    format_type = job["format"]
+    
+    async def finish(fields: dict):
+        await db.export_jobs.update_one(
+            export_job_claim(job),
+            {"$set": {**fields, "finished_at": datetime.now(timezone.utc).isoformat()}}
+        )
+    
+    # Another job may have produced the same artifact while this one was queued
+    cached = await find_cached_export(job["cache_key"], format_type)
+    if cached:
+        await finish({"state": "done", "stage": None, "reused": True, "rows_done": cached.get("rows_done", 0), "expires_at": cached["expires_at"]})
+        return
+    
+    async def progress(rows_done: int, spooled: bool):
+        # Each batch renews the claim; the last renewal (spooled) covers the
+        # render, which run_report bounds by REPORT_TIMEOUT_SECONDS
+        stage = "rendering" if spooled else "spooling"
+        result = await db.export_jobs.update_one(export_job_claim(job), {"$set": {
+            "rows_done": rows_done,
+            "stage": stage,
+            "claimed_until": datetime.now(timezone.utc) + timedelta(seconds=EXPORT_JOB_CLAIM_SECONDS)
+        }})
+        if result.matched_count == 0:
+            raise RuntimeError(f"Export job {job['id']} was claimed by another worker")
+    
+    if job["kind"] == "all_data":
+        output_path = await render_all_data_export(progress)
+    else:
+        spec = EXPORT_KINDS[job["kind"]]
+        build_row, render, options, limit = spec["formats"][format_type]
+        cursor = db[spec["collection"]].find(job["query"], EXPORT_PROJECTION).sort("created_at", -1).batch_size(EXPORT_BATCH_SIZE)
+        if limit:
+            cursor = cursor.limit(limit)
+        output_path = await render_export(cursor, build_row, render, format_type, *options, progress=progress)
+    
+    await aiofiles.os.replace(output_path, export_artifact_path(job["cache_key"], format_type))
+    await finish({
+        "state": "done",
+        "stage": None,
+        "expires_at": datetime.now(timezone.utc) + timedelta(seconds=EXPORT_ARTIFACT_TTL_SECONDS)
+    })
+
+async def export_job_worker():
+    while True:
+        job = None
+        try:
+            # Clear before claiming so a job queued during the claim still wakes us
+            _export_job_wakeup.clear()
+            job = await claim_export_job()
+            if job:
+                await run_export_job(job)
+                continue
+        except HTTPException as e:
+            if job and e.status_code == 503:
+                # Render pool is saturated by interactive exports; try again shortly
+                await db.export_jobs.update_one(export_job_claim(job), {"$set": {"state": "queued", "stage": None}})
+                await asyncio.sleep(5)
+                continue
+            await mark_export_job_failed(job, e.detail)
+            continue
+        except Exception as e:
+            logger.error(f"Export job worker error: {str(e)}")
+            await mark_export_job_failed(job, str(e))
+            continue
+        try:
+            await asyncio.wait_for(_export_job_wakeup.wait(), timeout=EXPORT_JOB_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+async def mark_export_job_failed(job: Optional[dict], error: str):
+    if not job:
+        return
+    try:
+        now = datetime.now(timezone.utc)
+        await db.export_jobs.update_one(export_job_claim(job), {"$set": {
+            "state": "failed",
+            "stage": None,
+            "error": error,
+            "finished_at": now.isoformat(),
+            "expires_at": now + timedelta(seconds=EXPORT_ARTIFACT_TTL_SECONDS)
+        }})
+    except Exception as e:
+        logger.error(f"Failed to record export job failure: {str(e)}")
+
+@app.on_event("startup")
+async def start_export_job_workers():
+    app.state.export_job_workers = [asyncio.create_task(export_job_worker()) for _ in range(EXPORT_JOB_WORKERS)]
+
+@scheduled_job("export_cleanup", EXPORT_CLEANUP_SECONDS)
+async def cleanup_export_artifacts() -> dict:
+    """Delete expired artifacts and temp files orphaned by a crashed worker.
+    
+    Job documents themselves are removed by the TTL index on expires_at.
+    """
+    now = datetime.now(timezone.utc)
+    live_keys = set(await db.export_jobs.distinct(
+        "cache_key",
+        {"state": {"$in": ["queued", "running", "done"]}, "$or": [{"expires_at": None}, {"expires_at": {"$gt": now}}]}
+    ))
+    
+    def sweep() -> dict:
+        counts = {"artifacts": 0, "temp_files": 0}
+        for path in EXPORT_ARTIFACT_DIR.iterdir():
+            if path.stem not in live_keys:
+                path.unlink(missing_ok=True)
+                counts["artifacts"] += 1
+        cutoff = time.time() - EXPORT_JOB_CLAIM_SECONDS * 2
+        for path in EXPORT_TMP_DIR.iterdir():
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                counts["temp_files"] += 1
+        return counts
+    
+    return await asyncio.to_thread(sweep)
+
+async def get_export_job_for_user(job_id: str, current_user: dict) -> dict:
+    job = await db.export_jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job["owner_id"] != current_user["id"] and current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="You can only view your own export jobs")
+    return job
+
+@api_router.post("/export/jobs", response_model=ExportJobResponse)
+async def create_export_job(job_data: ExportJobCreate, current_user: dict = Depends(get_current_user)):
+    """Queue an export, or return a finished one at once if the data has not changed"""
+    if current_user["role"] not in ["admin", "staff"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if job_data.kind not in EXPORT_KINDS:
+        raise HTTPException(status_code=400, detail=f"Invalid kind. Use {', '.join(EXPORT_KINDS)}")
+    formats = EXPORT_KINDS[job_data.kind]["formats"]
+    if job_data.format not in formats:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Use {', '.join(formats)}")
+    if job_data.kind == "all_data" and current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    query = {} if job_data.kind == "all_data" else build_export_query(current_user, job_data.status)
+    cache_key, rows_total = await export_cache_key(job_data.kind, job_data.format, query)
+    
+    now = datetime.now(timezone.utc)
+    job = {
+        "id": str(uuid.uuid4()),
+        "kind": job_data.kind,
+        "format": job_data.format,
+        "status_filter": job_data.status,
+        "query": query,
+        "cache_key": cache_key,
+        "owner_id": current_user["id"],
+        "state": "queued",
+        "stage": None,
+        "rows_total": rows_total,
+        "rows_done": 0,
+        "reused": False,
+        "error": None,
+        "filename": f"{EXPORT_KINDS[job_data.kind]['filename']}_{now.strftime('%Y%m%d_%H%M%S')}.{job_data.format}",
+        "created_at": now.isoformat(),
+        "finished_at": None,
+        "expires_at": None
+    }
+    
+    cached = await find_cached_export(cache_key, job_data.format)
+    if cached:
+        job.update({
+            "state": "done",
+            "reused": True,
+            "rows_done": cached.get("rows_done", 0),
+            "finished_at": now.isoformat(),
+            "expires_at": cached["expires_at"]
+        })
+    
+    await db.export_jobs.insert_one(job)
+    if not cached:
+        _export_job_wakeup.set()
+    return export_job_response(job)
+
+@api_router.get("/export/jobs/{job_id}", response_model=ExportJobResponse)
+async def get_export_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await get_export_job_for_user(job_id, current_user)
+    return export_job_response(job)
+
+@api_router.get("/export/jobs/{job_id}/download")
+async def download_export_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await get_export_job_for_user(job_id, current_user)
+    if job["state"] != "done":
+        raise HTTPException(status_code=409, detail=f"Export is not ready (state: {job['state']})")
+    if job["expires_at"].replace(tzinfo=timezone.utc) <= datetime.now(timezone.utc):
+        raise HTTPException(status_code=410, detail="Export has expired, please request it again")
+    
+    artifact_path = export_artifact_path(job["cache_key"], job["format"])
+    try:
+        stat_result = await aiofiles.os.stat(artifact_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=410, detail="Export has expired, please request it again")
     
     return StreamingResponse(
-        buffer,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        headers={"Content-Disposition": f"attachment; filename=recommendation_requests_{datetime.now().strftime('%Y%m%d')}.docx"}
+        iter_file(artifact_path, 0, stat_result.st_size),
+        media_type=EXPORT_MEDIA_TYPES[job["format"]],
+        headers={
+            "Content-Disposition": f"attachment; filename={job['filename']}",
+            "Content-Length": str(stat_result.st_size)
+        }
     )
 
 # ==================== ADMIN DATA MANAGEMENT ====================
@@ -2278,15 +4683,56 @@ async def export_all_data_pdf(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    # Fetch all data
+    output_path = await render_all_data_export()
+    return await spooled_file_response(
+        output_path,
+        "application/pdf",
+        f"wbs_complete_data_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    )
+
+async def render_all_data_export(progress=None) -> Path:
+    """Fetch the admin full-data report rows and render them in the report pool"""
+    # Fetch all data, keeping only the cells the report shows
     users = await db.users.find({"role": {"$ne": "admin"}}, {"_id": 0, "password_hash": 0}).to_list(1000)
-    transcripts = await db.transcript_requests.find({}, {"_id": 0}).to_list(1000)
-    recommendations = await db.recommendation_requests.find({}, {"_id": 0}).to_list(1000)
-    notifications = await db.notifications.find({}, {"_id": 0}).to_list(1000)
-    
-    # Generate PDF
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(letter), topMargin=0.5*inch, bottomMargin=0.5*inch)
+    transcripts = await db.transcript_requests.find({}, EXPORT_PROJECTION).to_list(1000)
+    recommendations = await db.recommendation_requests.find({}, EXPORT_PROJECTION).to_list(1000)
+    notification_count = await db.notifications.count_documents({})
+    
+    user_rows = [[
+        user.get("full_name", ""),
+        user.get("email", ""),
+        user.get("role", ""),
+        str(user.get("created_at", ""))[:19]
+    ] for user in users]
+    transcript_rows = [[
+        req.get("student_name", ""),
+        req.get("status", ""),
+        format_years_for_export(req.get("academic_years", req.get("academic_year", "")))[:30],
+        req.get("collection_method", ""),
+        str(req.get("created_at", ""))[:10]
+    ] for req in transcripts]
+    recommendation_rows = [[
+        req.get("student_name", ""),
+        str(req.get("institution_name", ""))[:25],
+        str(req.get("program_name", ""))[:20],
+        req.get("status", ""),
+        str(req.get("created_at", ""))[:10]
+    ] for req in recommendations]
+    
+    if progress:
+        await progress(len(user_rows) + len(transcript_rows) + len(recommendation_rows), True)
+    
+    output_path = EXPORT_TMP_DIR / f"{uuid.uuid4()}.pdf"
+    try:
+        await run_report(render_all_data_pdf, str(output_path), user_rows, transcript_rows, recommendation_rows, notification_count,
+                         on_abandon=lambda: output_path.unlink(missing_ok=True))
+    except BaseException:
+        output_path.unlink(missing_ok=True)
+        raise
+    return output_path
+
+def render_all_data_pdf(output_path: str, users: List[list], transcripts: List[list], recommendations: List[list], notification_count: int):
+    doc = SimpleDocTemplate(output_path, pagesize=landscape(letter), topMargin=0.5*inch, bottomMargin=0.5*inch)
     elements = []
     styles = getSampleStyleSheet()
     
@@ -2309,7 +4755,7 @@ async def export_all_data_pdf(current_user: dict = Depends(get_current_user)):
         ["Users (non-admin)", str(len(users))],
         ["Transcript Requests", str(len(transcripts))],
         ["Recommendation Requests", str(len(recommendations))],
-        ["Notifications", str(len(notifications))],
+        ["Notifications", str(notification_count)],
     ]
     summary_table = Table(summary_data, colWidths=[3*inch, 1.5*inch])
     summary_table.setStyle(TableStyle([
@@ -2328,14 +4774,7 @@ async def export_all_data_pdf(current_user: dict = Depends(get_current_user)):
     # Users Section
     if users:
         elements.append(Paragraph("Users (Non-Admin)", styles['Heading2']))
-        user_data = [["Name", "Email", "Role", "Created At"]]
-        for user in users:
-            user_data.append([
-                user.get("full_name", ""),
-                user.get("email", ""),
-                user.get("role", ""),
-                str(user.get("created_at", ""))[:19]
-            ])
+        user_data = [["Name", "Email", "Role", "Created At"]] + users
         user_table = Table(user_data, colWidths=[2.5*inch, 3*inch, 1*inch, 2*inch])
         user_table.setStyle(TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#800000')),
@@ -2353,18 +4792,7 @@ async def export_all_data_pdf(current_user: dict = Depends(get_current_user)):
     # Transcript Requests Section
     if transcripts:
         elements.append(Paragraph("Transcript Requests", styles['Heading2']))
-        transcript_data = [["Student", "Status", "Academic Years", "Collection", "Created At"]]
-        for req in transcripts:
-            academic_years = req.get("academic_years", req.get("academic_year", ""))
-            if isinstance(academic_years, list):
-                academic_years = ", ".join([f"{y.get('from_year', '')}-{y.get('to_year', '')}" for y in academic_years])
-            transcript_data.append([
-                req.get("student_name", ""),
-                req.get("status", ""),
-                str(academic_years)[:30],
-                req.get("collection_method", ""),
-                str(req.get("created_at", ""))[:10]
-            ])
+        transcript_data = [["Student", "Status", "Academic Years", "Collection", "Created At"]] + transcripts
         transcript_table = Table(transcript_data, colWidths=[2*inch, 1.2*inch, 2*inch, 1.3*inch, 1.5*inch])
         transcript_table.setStyle(TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#800000')),
@@ -2382,15 +4810,7 @@ async def export_all_data_pdf(current_user: dict = Depends(get_current_user)):
     # Recommendation Requests Section
     if recommendations:
         elements.append(Paragraph("Recommendation Requests", styles['Heading2']))
-        rec_data = [["Student", "Institution", "Program", "Status", "Created At"]]
-        for req in recommendations:
-            rec_data.append([
-                req.get("student_name", ""),
-                str(req.get("institution_name", ""))[:25],
-                str(req.get("program_name", ""))[:20],
-                req.get("status", ""),
-                str(req.get("created_at", ""))[:10]
-            ])
+        rec_data = [["Student", "Institution", "Program", "Status", "Created At"]] + recommendations
         rec_table = Table(rec_data, colWidths=[2*inch, 2.5*inch, 1.8*inch, 1.2*inch, 1.2*inch])
         rec_table.setStyle(TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#800000')),
@@ -2407,13 +4827,6 @@ async def export_all_data_pdf(current_user: dict = Depends(get_current_user)):
     
     # Build PDF
     doc.build(elements)
-    buffer.seek(0)
-    
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=wbs_complete_data_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"}
-    )
 
 @api_router.delete("/admin/clear-all-data")
 async def clear_all_data(current_user: dict = Depends(get_current_user)):
@@ -2430,6 +4843,8 @@ async def clear_all_data(current_user: dict = Depends(get_current_user)):
         
         # Delete all recommendation requests
         recommendations_result = await db.recommendation_requests.delete_many({})
+        await bump_change_counter("transcript_requests")
+        await bump_change_counter("recommendation_requests")
         
         # Delete all notifications
         notifications_result = await db.notifications.delete_many({})
@@ -2437,12 +4852,41 @@ async def clear_all_data(current_user: dict = Depends(get_current_user)):
         # Delete all password reset tokens
         password_resets_result = await db.password_resets.delete_many({})
         
+        # Delete all timeline event buckets
+        request_events_result = await db.request_events.delete_many({})
+        
+        # Tombstones are superseded by reset markers that send every /changes
+        # client back to a full resync
+        deletions_result = await db.deletions.delete_many({"reset": {"$ne": True}})
+        await record_collection_reset("transcript_requests")
+        await record_collection_reset("recommendation_requests")
+        
+        # No document references remain, so the blob store goes too
+        documents_result = await db.documents.delete_many({})
+        blobs_result = await db.blobs.delete_many({})
+        await asyncio.to_thread(shutil.rmtree, BLOB_DIR, True)
+        
+        # Cached exports hold copies of the cleared data
+        export_jobs_result = await db.export_jobs.delete_many({})
+        await asyncio.to_thread(shutil.rmtree, EXPORT_ARTIFACT_DIR, True)
+        EXPORT_ARTIFACT_DIR.mkdir(exist_ok=True)
+        
+        # Reset analytics counters to match the emptied collections
+        await rebuild_analytics_rollups()
+        invalidate_role_members()
+        invalidate_cached_user()
+        
         deleted_counts = {
             "users": users_result.deleted_count,
             "transcript_requests": transcripts_result.deleted_count,
             "recommendation_requests": recommendations_result.deleted_count,
             "notifications": notifications_result.deleted_count,
-            "password_resets": password_resets_result.deleted_count
+            "password_resets": password_resets_result.deleted_count,
+            "documents": documents_result.deleted_count,
+            "request_events": request_events_result.deleted_count,
+            "deletions": deletions_result.deleted_count,
+            "blobs": blobs_result.deleted_count,
+            "export_jobs": export_jobs_result.deleted_count
         }
         
         total_deleted = sum(deleted_counts.values())
@@ -2477,6 +4921,201 @@ async def get_data_summary(current_user: dict = Depends(get_current_user)):
         "total": users_count + transcripts_count + recommendations_count + notifications_count
     }
 
+# ==================== SCHEMA MIGRATIONS ====================
+
+# Each migration upgrades one collection to a schema_version. Migrations are
+# idempotent and batched: a document is only touched while below the target
+# version, so an interrupted run simply resumes where it stopped. Runs hold the
+# "schema_migrations" job lease so the CLI and API workers never overlap.
+MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', '500'))
+MIGRATION_LEASE_SECONDS = 300
+RUN_MIGRATIONS_ON_STARTUP = os.environ.get('RUN_MIGRATIONS_ON_STARTUP', 'true').lower() == 'true'
+
+MIGRATIONS = []
+
+def migration(collection_name: str, version: int):
+    """Register func(doc) -> fields to $set, upgrading collection_name to version"""
+    def decorator(func):
+        MIGRATIONS.append({"collection": collection_name, "version": version, "name": func.__name__, "func": func})
+        return func
+    return decorator
+
+@migration("transcript_requests", 1)
+def normalize_transcript_documents(doc: dict) -> dict:
+    """Store academic_years as a list with its academic_year string, and fill defaults"""
+    return normalized_changes(normalize_transcript_data, doc)
+
+@migration("recommendation_requests", 1)
+def normalize_recommendation_documents(doc: dict) -> dict:
+    """Store years_attended as a list with its years_attended_str, and fill defaults"""
+    return normalized_changes(normalize_recommendation_data, doc)
+
+def below_version(version: int) -> dict:
+    return {"$or": [{"schema_version": {"$lt": version}}, {"schema_version": {"$exists": False}}]}
+
+async def apply_migration(entry: dict) -> int:
+    """Run one migration to completion, renewing the lease after every batch"""
+    collection = db[entry["collection"]]
+    key = f"{entry['collection']}:{entry['version']}"
+    pending = below_version(entry["version"])
+    
+    remaining = await collection.count_documents(pending)
+    if not remaining:
+        return 0
+    logger.info(f"Migration {key} ({entry['name']}): {remaining} document(s) to migrate")
+    await db.migrations.update_one(
+        {"_id": key},
+        {"$set": {"name": entry["name"], "state": "running", "started_at": datetime.now(timezone.utc).isoformat()}},
+        upsert=True
+    )
+    
+    migrated = 0
+    last_id = None
+    while True:
+        query = pending if last_id is None else {"$and": [pending, {"_id": {"$gt": last_id}}]}
+        batch = await collection.find(query).sort("_id", ASCENDING).limit(MIGRATION_BATCH_SIZE).to_list(MIGRATION_BATCH_SIZE)
+        if not batch:
+            break
+        
+        # Guard on version so a request edited mid-batch is left for the next run
+        operations = [
+            UpdateOne(
+                {"_id": doc["_id"], "version": doc.get("version"), "schema_version": doc.get("schema_version")},
+                {"$set": {**entry["func"](doc), "schema_version": entry["version"]}}
+            )
+            for doc in batch
+        ]
+        result = await collection.bulk_write(operations, ordered=False)
+        migrated += result.modified_count
+        last_id = batch[-1]["_id"]
+        
+        await db.migrations.update_one({"_id": key}, {"$inc": {"migrated": result.modified_count}})
+        logger.info(f"Migration {key}: {migrated}/{remaining} migrated")
+        if not await acquire_job_lease("schema_migrations", MIGRATION_LEASE_SECONDS):
+            raise RuntimeError(f"Lost the migration lease during {key}")
+    
+    state = "done" if not await collection.count_documents(pending) else "incomplete"
+    await db.migrations.update_one(
+        {"_id": key},
+        {"$set": {"state": state, "finished_at": datetime.now(timezone.utc).isoformat()}}
+    )
+    logger.info(f"Migration {key} {state}: {migrated} document(s) migrated")
+    return migrated
+
+async def run_migrations() -> Optional[dict]:
+    """Apply every pending migration in version order.
+    
+    Returns migrated counts per migration, or None if another process holds
+    the migration lease.
+    """
+    if not await acquire_job_lease("schema_migrations", MIGRATION_LEASE_SECONDS):
+        logger.info("Schema migrations are running elsewhere, skipping")
+        return None
+    
+    counts = {}
+    try:
+        for entry in sorted(MIGRATIONS, key=lambda m: m["version"]):
+            counts[f"{entry['collection']}:{entry['version']}"] = await apply_migration(entry)
+    finally:
+        # Release the lease so a later run does not have to wait for it to expire
+        await db.scheduled_jobs.update_one(
+            {"_id": "schema_migrations", "owner": WORKER_ID},
+            {"$set": {"lease_expires_at": datetime.now(timezone.utc)}}
+        )
+    return counts
+
+async def get_migration_status() -> List[dict]:
+    """Pending document count and last recorded run of each migration"""
+    status_list = []
+    for entry in sorted(MIGRATIONS, key=lambda m: m["version"]):
+        key = f"{entry['collection']}:{entry['version']}"
+        record = await db.migrations.find_one({"_id": key}) or {}
+        status_list.append({
+            "migration": key,
+            "name": entry["name"],
+            "pending": await db[entry["collection"]].count_documents(below_version(entry["version"])),
+            "state": record.get("state", "pending"),
+            "migrated": record.get("migrated", 0),
+            "started_at": record.get("started_at"),
+            "finished_at": record.get("finished_at")
+        })
+    return status_list
+
+async def run_startup_migrations():
+    try:
+        await run_migrations()
+    except Exception as e:
+        logger.error(f"Schema migrations failed: {str(e)}")
+
+@app.on_event("startup")
+async def start_migrations():
+    # Runs in the background; unmigrated documents are still normalized on read meanwhile
+    app.state.migration_tasks = [asyncio.create_task(run_startup_migrations())] if RUN_MIGRATIONS_ON_STARTUP else []
+
+@api_router.get("/admin/migrations")
+async def get_migrations(current_user: dict = Depends(get_current_user)):
+    """Pending documents and last run of each schema migration"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return await get_migration_status()
+
+# ==================== DATABASE INDEXES ====================
+
+async def get_index_report() -> dict:
+    """Compare declared INDEXES against the live collections.
+    
+    Reports, per collection, declared indexes that are missing, live indexes
+    that are not declared, and declared indexes with no recorded accesses
+    according to $indexStats (counters reset on mongod restart).
+    """
+    report = {}
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        declared = {model.document["name"] for model in models}
+        existing = set()
+        async for index in collection.list_indexes():
+            existing.add(index["name"])
+        
+        unused = []
+        try:
+            async for stat in collection.aggregate([{"$indexStats": {}}]):
+                if stat["name"] in declared and stat.get("accesses", {}).get("ops", 0) == 0:
+                    unused.append(stat["name"])
+        except OperationFailure as e:
+            logger.warning(f"$indexStats unavailable for {collection_name}: {str(e)}")
+        
+        report[collection_name] = {
+            "missing": sorted(declared - existing),
+            "extra": sorted(existing - declared - {"_id_"}),
+            "unused": sorted(unused)
+        }
+    return report
+
+@app.on_event("startup")
+async def ensure_indexes():
+    """Build any declared index that does not exist yet"""
+    for collection_name, models in INDEXES.items():
+        for model in models:
+            try:
+                await db[collection_name].create_indexes([model])
+            except OperationFailure as e:
+                # e.g. duplicate emails blocking a unique index - keep serving, but make it loud
+                logger.error(f"Failed to create index {collection_name}.{model.document['name']}: {str(e)}")
+    
+    report = await get_index_report()
+    for collection_name, entry in report.items():
+        if entry["missing"] or entry["extra"]:
+            logger.warning(f"Index drift on {collection_name}: missing={entry['missing']} extra={entry['extra']}")
+
+@api_router.get("/admin/indexes")
+async def get_indexes(current_user: dict = Depends(get_current_user)):
+    """Report missing, extra and unused indexes per collection"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return await get_index_report()
+
 # ==================== SEED DEFAULT ADMIN ====================
 
 @app.on_event("startup")
@@ -2492,26 +5131,35 @@ async def seed_default_admin():
             "id": admin_id,
             "email": admin_email,
             "full_name": "System Administrator",
-            "password_hash": hash_password("Admin123!"),
+            "password_hash": await hash_password("Admin123!"),
             "role": "admin",
             "created_at": now,
             "updated_at": now
         }
         
         await db.users.insert_one(admin_doc)
+        invalidate_role_members("admin")
         logger.info("Default admin account created: admin@wolmers.org / Admin123!")
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Added before CORS so that 413 responses still carry the CORS headers
+app.add_middleware(UploadSizeLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in app.state.scheduler_tasks + app.state.email_workers + app.state.export_job_workers + app.state.migration_tasks + app.state.notification_watchers:
+        task.cancel()
+    bcrypt_executor.shutdown(wait=False)
+    report_executor.shutdown(wait=False, cancel_futures=True)
     client.close()
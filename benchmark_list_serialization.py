@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark list serialization for /requests/all and /recommendations/all.
+
+Compares the previous path (a model per row, then FastAPI validating and
+encoding the list again through response_model) with the single TypeAdapter
+pass used by list_response. No database is needed: rows are synthetic but
+shaped like normalized documents.
+
+Run from the repository root with the backend requirements installed:
+
+    python benchmark_list_serialization.py [rows] [repeats]
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# server.py reads these at import time; the client never connects here
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+os.environ.setdefault("JWT_SECRET", "benchmark")
+os.environ.setdefault("RUN_MIGRATIONS_ON_STARTUP", "false")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi import Response  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+
+import server  # noqa: E402
+
+
+def make_transcript_rows(count):
+    now = datetime.now(timezone.utc)
+    rows = []
+    for i in range(count):
+        created = (now - timedelta(minutes=i)).isoformat()
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "student_id": str(uuid.uuid4()),
+            "student_name": f"Student {i}",
+            "student_email": f"student{i}@example.com",
+            "first_name": "Student",
+            "middle_name": "",
+            "last_name": str(i),
+            "school_id": f"WBS{i:05d}",
+            "enrollment_status": "graduate",
+            "academic_years": [{"from_year": "2015", "to_year": "2020"}],
+            "academic_year": "2015-2020",
+            "reason": "University application",
+            "needed_by_date": "2026-12-01",
+            "collection_method": "pickup",
+            "institution_name": "University of the West Indies",
+            "status": "Pending",
+            "assigned_staff_id": None,
+            "assigned_staff_name": None,
+            "created_at": created,
+            "updated_at": created,
+            "schema_version": 1,
+        })
+    return rows
+
+
+def make_recommendation_rows(count):
+    now = datetime.now(timezone.utc)
+    rows = []
+    for i in range(count):
+        created = (now - timedelta(minutes=i)).isoformat()
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "student_id": str(uuid.uuid4()),
+            "student_name": f"Student {i}",
+            "student_email": f"student{i}@example.com",
+            "first_name": "Student",
+            "middle_name": "",
+            "last_name": str(i),
+            "email": f"student{i}@example.com",
+            "years_attended": [{"from_year": "2015", "to_year": "2020"}],
+            "years_attended_str": "2015-2020",
+            "enrollment_status": "graduate",
+            "last_form_class": "6B",
+            "reason": "Scholarship",
+            "institution_name": "University of the West Indies",
+            "program_name": "Computer Science",
+            "needed_by_date": "2026-12-01",
+            "collection_method": "emailed",
+            "status": "In Progress",
+            "assigned_staff_id": str(uuid.uuid4()),
+            "assigned_staff_name": "Staff Member",
+            "created_at": created,
+            "updated_at": created,
+            "schema_version": 1,
+        })
+    return rows
+
+
+def find_route(path):
+    for route in server.app.routes:
+        if getattr(route, "path", None) == path:
+            return route
+    raise RuntimeError(f"Route {path} not found")
+
+
+async def previous_path(route, model, rows):
+    """Model per row, then response_model validation and jsonable encoding"""
+    content = [model(**r) for r in rows]
+    encoded = await serialize_response(field=route.response_field, response_content=content)
+    return JSONResponse(content=encoded).body
+
+
+async def fast_path(adapter, rows):
+    return server.list_response(adapter, rows, Response()).body
+
+
+def time_it(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        asyncio.run(func())
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    cases = [
+        ("get_all_requests", "/api/requests/all", server.TranscriptRequestSummary,
+         server.TRANSCRIPT_SUMMARY_LIST, make_transcript_rows(row_count)),
+        ("get_all_recommendation_requests", "/api/recommendations/all", server.RecommendationRequestSummary,
+         server.RECOMMENDATION_SUMMARY_LIST, make_recommendation_rows(row_count)),
+    ]
+
+    print(f"{row_count} rows, median of {repeats} runs")
+    for name, path, model, adapter, rows in cases:
+        route = find_route(path)
+        # Both paths must produce the same JSON document
+        assert json.loads(asyncio.run(previous_path(route, model, rows))) == json.loads(asyncio.run(fast_path(adapter, rows)))
+
+        before = time_it(lambda: previous_path(route, model, rows), repeats)
+        after = time_it(lambda: fast_path(adapter, rows), repeats)
+        print(f"{name:34s} previous {before:8.2f} ms   TypeAdapter {after:8.2f} ms   {before / after:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -46,7 +46,7 @@ export const authAPI = {
 // User Management API (Admin)
 export const userAPI = {
   createUser: (data) => api.post('/admin/users', data),
-  getAllUsers: () => api.get('/admin/users'),
+  getAllUsers: (params) => api.get('/admin/users', { params }),
   getStaffMembers: () => api.get('/admin/staff'),
   deleteUser: (userId) => api.delete(`/admin/users/${userId}`),
   resetUserPassword: (userId, newPassword) => api.post(`/admin/users/${userId}/reset-password`, { new_password: newPassword }),
@@ -55,9 +55,11 @@ export const userAPI = {
 // Transcript Request API
 export const requestAPI = {
   create: (data) => api.post('/requests', data),
-  getAll: () => api.get('/requests'),
-  getAllRequests: () => api.get('/requests/all'),
+  getAll: (params) => api.get('/requests', { params }),
+  getAllRequests: (params) => api.get('/requests/all', { params }),
+  getChanges: (params) => api.get('/requests/changes', { params }),
   getById: (id) => api.get(`/requests/${id}`),
+  getTimeline: (id, params) => api.get(`/requests/${id}/timeline`, { params }),
   update: (id, data) => api.patch(`/requests/${id}`, data),
   editAsStudent: (id, data) => api.put(`/requests/${id}/edit`, data),
   uploadDocument: (id, file) => {
@@ -68,14 +70,17 @@ export const requestAPI = {
     });
   },
   getDocument: (documentId) => api.get(`/documents/${documentId}`),
+  downloadDocument: (documentId) => api.get(`/documents/${documentId}/download`, { responseType: 'blob' }),
 };
 
 // Recommendation Letter Request API
 export const recommendationAPI = {
   create: (data) => api.post('/recommendations', data),
-  getAll: () => api.get('/recommendations'),
-  getAllRequests: () => api.get('/recommendations/all'),
+  getAll: (params) => api.get('/recommendations', { params }),
+  getAllRequests: (params) => api.get('/recommendations/all', { params }),
+  getChanges: (params) => api.get('/recommendations/changes', { params }),
   getById: (id) => api.get(`/recommendations/${id}`),
+  getTimeline: (id, params) => api.get(`/recommendations/${id}/timeline`, { params }),
   update: (id, data) => api.patch(`/recommendations/${id}`, data),
   editAsStudent: (id, data) => api.put(`/recommendations/${id}/edit`, data),
   uploadDocument: (id, file) => {
@@ -85,6 +90,8 @@ export const recommendationAPI = {
       headers: { 'Content-Type': 'multipart/form-data' },
     });
   },
+  getDocument: (documentId) => api.get(`/documents/${documentId}`),
+  downloadDocument: (documentId) => api.get(`/documents/${documentId}/download`, { responseType: 'blob' }),
 };
 
 // Export API
@@ -97,19 +104,76 @@ export const exportAPI = {
     const params = status ? `?status=${status}` : '';
     return api.get(`/export/recommendations/${format}${params}`, { responseType: 'blob' });
   },
+  createJob: (data) => api.post('/export/jobs', data),
+  getJob: (jobId) => api.get(`/export/jobs/${jobId}`),
+  downloadJob: (jobId) => api.get(`/export/jobs/${jobId}/download`, { responseType: 'blob' }),
+};
+
+// Notification stream. EventSource cannot send an Authorization header, so each
+// connection uses a short-lived stream token; when the connection drops we
+// fetch a fresh token and resume from the last event we saw.
+const STREAM_RETRY_MS = 5000;
+
+const openNotificationStream = ({ onNotification, onUnread } = {}) => {
+  let source = null;
+  let lastEventId = null;
+  let retryTimer = null;
+  let closed = false;
+
+  const retry = () => {
+    if (!closed) {
+      retryTimer = setTimeout(connect, STREAM_RETRY_MS);
+    }
+  };
+
+  const connect = async () => {
+    try {
+      const { data } = await api.post('/notifications/stream-token');
+      if (closed) return;
+      const params = new URLSearchParams({ stream_token: data.token });
+      if (lastEventId) {
+        params.set('last_event_id', lastEventId);
+      }
+      source = new EventSource(`${API_URL}/notifications/stream?${params}`);
+      source.addEventListener('notification', (event) => {
+        lastEventId = event.lastEventId;
+        if (onNotification) onNotification(JSON.parse(event.data));
+      });
+      source.addEventListener('unread', (event) => {
+        if (onUnread) onUnread(JSON.parse(event.data).count);
+      });
+      source.onerror = () => {
+        // The browser would retry with the same, possibly expired, token
+        source.close();
+        retry();
+      };
+    } catch (error) {
+      retry();
+    }
+  };
+
+  connect();
+  return {
+    close: () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    },
+  };
 };
 
 // Notification API
 export const notificationAPI = {
-  getAll: () => api.get('/notifications'),
+  getAll: (params) => api.get('/notifications', { params }),
   getUnreadCount: () => api.get('/notifications/unread-count'),
+  openStream: (handlers) => openNotificationStream(handlers),
   markAsRead: (id) => api.patch(`/notifications/${id}/read`),
   markAllAsRead: () => api.patch('/notifications/read-all'),
 };
 
 // Analytics API
 export const analyticsAPI = {
-  get: () => api.get('/analytics'),
+  get: (params) => api.get('/analytics', { params }),
 };
 
 // Admin Data Management API
@@ -53,18 +53,22 @@ export default function AdminDashboard() {
     fetchData();
   }, []);
 
+  useEffect(() => {
+    // The stream sends the current unread count on connect and on every change
+    const stream = notificationAPI.openStream({ onUnread: setUnreadCount });
+    return () => stream.close();
+  }, []);
+
   const fetchData = async () => {
     try {
-      const [analyticsRes, requestsRes, recommendationsRes, unreadRes] = await Promise.all([
+      const [analyticsRes, requestsRes, recommendationsRes] = await Promise.all([
         analyticsAPI.get(),
         requestAPI.getAllRequests(),
         recommendationAPI.getAllRequests(),
-        notificationAPI.getUnreadCount(),
       ]);
       setAnalytics(analyticsRes.data);
       setRecentRequests(requestsRes.data.slice(0, 5));
       setRecentRecommendations(recommendationsRes.data.slice(0, 5));
-      setUnreadCount(unreadRes.data.count);
     } catch (error) {
       toast.error('Failed to load dashboard data');
     } finally {
@@ -31,16 +31,20 @@ export default function StudentDashboard() {
     fetchData();
   }, []);
 
+  useEffect(() => {
+    // The stream sends the current unread count on connect and on every change
+    const stream = notificationAPI.openStream({ onUnread: setUnreadCount });
+    return () => stream.close();
+  }, []);
+
   const fetchData = async () => {
     try {
-      const [transcriptsRes, recommendationsRes, unreadRes] = await Promise.all([
+      const [transcriptsRes, recommendationsRes] = await Promise.all([
         requestAPI.getAll(),
         recommendationAPI.getAll(),
-        notificationAPI.getUnreadCount(),
       ]);
       setTranscriptRequests(transcriptsRes.data);
       setRecommendationRequests(recommendationsRes.data);
-      setUnreadCount(unreadRes.data.count);
     } catch (error) {
       toast.error('Failed to load data');
     } finally {